@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import sys
 import os
@@ -6,10 +7,19 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.logger import setup_logger
-from src.utils import load_config, load_private_keys, load_recipient_addresses
+from src.utils import load_private_keys, load_recipient_addresses
+from src.settings import load_settings
 from src.sender import TokenSender
+from src.planner import TransferPlanner, save_plan, load_plan, find_latest_plan
+from src.profiler import RunProfiler, profile_section
+from src.watcher import DepositWatcher
+from src.sharding import ShardedRunner
+from src.cache import get_block_cache
+from src.journal import find_latest_journal
+from src.keystore import convert_keys_to_store
+from src.transport import benchmark_transport, orjson
+from src.reconciler import Reconciler
 from src.colors import Colors
-from web3 import Web3
 
 def print_header():
     """Выводит красивый заголовок программы"""
@@ -17,19 +27,19 @@ def print_header():
     print(f"{Colors.BOLD}{Colors.GREEN}🚀 ETH TOKEN SENDER v2.1{Colors.RESET}")
     print(f"{Colors.CYAN}{'=' * 60}{Colors.RESET}")
 
-def get_current_gas_info(config):
+def get_current_gas_info(settings):
     """Получает информацию о текущем газе"""
     try:
-        w3 = Web3(Web3.HTTPProvider(config['network']['rpc_url']))
-        if not w3.is_connected():
-            return None, None
+        # Общий кэш: повторный запрос в пределах того же блока не обращается к RPC
+        cache = get_block_cache(settings)
+        w3 = cache.w3
         
         # Получаем текущую цену газа
-        gas_price = w3.eth.gas_price
+        gas_price = cache.gas_price()
         gas_price_gwei = w3.from_wei(gas_price, 'gwei')
         
         # Рассчитываем стоимость транзакции в ETH
-        gas_limit = config['transaction']['gas_limit']
+        gas_limit = settings.transaction.gas_limit
         transaction_cost_wei = gas_price * gas_limit
         transaction_cost_eth = w3.from_wei(transaction_cost_wei, 'ether')
         
@@ -38,19 +48,19 @@ def get_current_gas_info(config):
     except Exception as e:
         return None, None
 
-def show_gas_info(config):
+def show_gas_info(settings):
     """Показывает информацию о текущем газе и автоматически возвращается в меню"""
     print(f"\n{Colors.BOLD}{Colors.CYAN}⛽ ИНФОРМАЦИЯ О ГАЗЕ:{Colors.RESET}")
     print(f"{Colors.YELLOW}Получаем данные...{Colors.RESET}")
     
-    gas_price_gwei, transaction_cost_eth = get_current_gas_info(config)
+    gas_price_gwei, transaction_cost_eth = get_current_gas_info(settings)
     
     if gas_price_gwei is not None:
         print(f"{Colors.GREEN}✅ Текущая цена газа: {gas_price_gwei:.2f} Gwei{Colors.RESET}")
         print(f"{Colors.BLUE}💰 Стоимость транзакции: {transaction_cost_eth:.8f} ETH{Colors.RESET}")
         
         # Показываем лимит из конфига
-        max_gas_gwei = config.get('gas_monitor', {}).get('max_gas_price_gwei', 'не установлен')
+        max_gas_gwei = settings.gas_monitor.max_gas_price_gwei
         if isinstance(max_gas_gwei, (int, float)):
             if gas_price_gwei <= max_gas_gwei:
                 print(f"{Colors.GREEN}✅ Газ в пределах лимита (лимит: {max_gas_gwei} Gwei){Colors.RESET}")
@@ -60,7 +70,7 @@ def show_gas_info(config):
             print(f"{Colors.YELLOW}ℹ️ Лимит газа: {max_gas_gwei}{Colors.RESET}")
     else:
         print(f"{Colors.RED}❌ Не удалось получить информацию о газе{Colors.RESET}")
-        print(f"{Colors.YELLOW}Проверьте подключение к RPC: {config['network']['rpc_url']}{Colors.RESET}")
+        print(f"{Colors.YELLOW}Проверьте подключение к RPC: {settings.network.rpc_url}{Colors.RESET}")
 
 def show_startup_menu():
     """Показывает стартовое меню"""
@@ -68,23 +78,117 @@ def show_startup_menu():
         print(f"\n{Colors.BOLD}{Colors.WHITE}📋 ГЛАВНОЕ МЕНЮ:{Colors.RESET}")
         print(f"{Colors.GREEN}1.{Colors.RESET} {Colors.WHITE}🚀 Запустить отправку токенов{Colors.RESET}")
         print(f"{Colors.BLUE}2.{Colors.RESET} {Colors.WHITE}⛽ Показать текущий Gwei{Colors.RESET}")
-        print(f"{Colors.RED}3.{Colors.RESET} {Colors.WHITE}❌ Выход{Colors.RESET}")
+        print(f"{Colors.CYAN}3.{Colors.RESET} {Colors.WHITE}📋 Построить план переводов (dry-run){Colors.RESET}")
+        print(f"{Colors.GREEN}4.{Colors.RESET} {Colors.WHITE}▶️ Выполнить сохраненный план{Colors.RESET}")
+        print(f"{Colors.MAGENTA}5.{Colors.RESET} {Colors.WHITE}👁️ Режим наблюдения за пополнениями{Colors.RESET}")
+        print(f"{Colors.BLUE}6.{Colors.RESET} {Colors.WHITE}🔎 Сверить результаты с сетью{Colors.RESET}")
+        print(f"{Colors.RED}7.{Colors.RESET} {Colors.WHITE}❌ Выход{Colors.RESET}")
         
         try:
-            choice = input(f"\n{Colors.YELLOW}Выберите пункт (1-3): {Colors.RESET}").strip()
+            choice = input(f"\n{Colors.YELLOW}Выберите пункт (1-7): {Colors.RESET}").strip()
             if choice == "1":
                 return "start"
             elif choice == "2":
                 return "gas_info"
             elif choice == "3":
+                return "plan"
+            elif choice == "4":
+                return "run_plan"
+            elif choice == "5":
+                return "watch"
+            elif choice == "6":
+                return "reconcile"
+            elif choice == "7":
                 print(f"{Colors.RED}👋 Программа завершена пользователем{Colors.RESET}")
                 return "exit"
             else:
-                print(f"{Colors.RED}❌ Неверный выбор. Введите 1, 2 или 3{Colors.RESET}")
+                print(f"{Colors.RED}❌ Неверный выбор. Введите число от 1 до 7{Colors.RESET}")
         except KeyboardInterrupt:
             print(f"\n{Colors.RED}👋 Программа завершена пользователем{Colors.RESET}")
             return "exit"
 
+def build_transfer_plan(logger, settings):
+    """Строит план переводов по текущему состоянию сети и сохраняет его в файл"""
+    try:
+        private_keys = load_private_keys()
+        recipient_addresses = load_recipient_addresses()
+
+        planner = TransferPlanner(settings, logger)
+        plan = planner.build_plan(private_keys, recipient_addresses)
+        planner.log_summary(plan)
+
+        plan_file = save_plan(plan)
+        logger.info(f"📋 План сохранен в {plan_file}")
+    except Exception as e:
+        logger.error(f"Ошибка при построении плана: {str(e)}")
+
+def ask_plan_file():
+    """Запрашивает путь к файлу плана (по умолчанию - последний сохраненный)"""
+    latest_plan = find_latest_plan()
+    hint = f" [{latest_plan}]" if latest_plan else ""
+    try:
+        plan_file = input(f"{Colors.YELLOW}Путь к файлу плана{hint}: {Colors.RESET}").strip()
+    except KeyboardInterrupt:
+        return None
+    return plan_file or latest_plan
+
+def ask_journal_file():
+    """Запрашивает путь к журналу результатов (по умолчанию - последний)"""
+    latest_journal = find_latest_journal()
+    hint = f" [{latest_journal}]" if latest_journal else ""
+    try:
+        journal_file = input(f"{Colors.YELLOW}Путь к журналу результатов{hint}: {Colors.RESET}").strip()
+    except KeyboardInterrupt:
+        return None
+    return journal_file or latest_journal
+
+def reconcile_results(logger, settings, journal_file):
+    """Сверяет журнал результатов прошлого запуска с текущим состоянием сети"""
+    if not journal_file or not os.path.exists(journal_file):
+        print(f"{Colors.RED}❌ Журнал результатов не найден{Colors.RESET}")
+        return
+    try:
+        Reconciler(settings, logger).reconcile(journal_file)
+    except Exception as e:
+        logger.error(f"Ошибка при сверке результатов: {str(e)}")
+
+def convert_private_keys(logger, store_path="data/private_keys.bin"):
+    """Однократно конвертирует data/private_keys.txt в бинарное хранилище ключей с адресами"""
+    try:
+        private_keys = load_private_keys(store_path=None)
+        logger.info(f"🔑 Конвертируем {len(private_keys)} ключей в {store_path} (адреса вычисляются один раз)...")
+        count = convert_keys_to_store(private_keys, store_path)
+        logger.info(f"🔑 Хранилище ключей создано: {store_path} ({count} записей)")
+    except Exception as e:
+        logger.error(f"Ошибка при конвертации ключей: {str(e)}")
+
+def run_transport_benchmark(logger, settings, calls):
+    """Сравнивает стандартный и облегченный RPC транспорт на RPC из конфига"""
+    logger.info(f"📡 Сравнение RPC транспорта: {calls} вызовов в {settings.execution.max_concurrent} потоков, "
+                f"{settings.network.rpc_url} (JSON: {'orjson' if orjson is not None else 'json'})")
+    try:
+        results = benchmark_transport(settings, calls)
+    except Exception as e:
+        logger.error(f"Ошибка при сравнении транспорта: {str(e)}")
+        return
+    for name, row in results.items():
+        logger.info(f"   {name:<18} {row['latency_ms']:>8.3f} мс/вызов, CPU {row['cpu_ms']:>8.3f} мс/вызов")
+
+async def run_deposit_watcher(logger, settings, profiler=None):
+    """Запускает режим наблюдения за пополнениями управляемых кошельков"""
+    private_keys = load_private_keys()
+    recipient_addresses = load_recipient_addresses()
+
+    if len(private_keys) != len(recipient_addresses):
+        logger.error(f"Количество приватных ключей ({len(private_keys)}) не соответствует "
+                     f"количеству адресов получателей ({len(recipient_addresses)})")
+        return
+
+    token_sender = TokenSender(settings, logger)
+    watcher = DepositWatcher(settings, logger, token_sender, private_keys, recipient_addresses)
+    with profile_section(profiler):
+        await watcher.run()
+
 def show_retry_menu(failed_accounts, skipped_accounts):
     """Показывает меню для повторного запуска неудачных аккаунтов"""
     total_failed = len(failed_accounts) + len(skipped_accounts)
@@ -123,6 +227,7 @@ def get_failed_account_data(failed_accounts, skipped_accounts, all_private_keys,
     for account in failed_accounts + skipped_accounts:
         account_id = account.get('account_id')
         if account_id:
+            # account_id - номер строки в исходных файлах (не зависит от перемешивания)
             failed_account_ids.add(account_id - 1)  # -1 потому что account_id начинается с 1
     
     # Извлекаем соответствующие ключи и адреса
@@ -133,19 +238,28 @@ def get_failed_account_data(failed_accounts, skipped_accounts, all_private_keys,
     
     return failed_private_keys, failed_recipient_addresses
 
-async def run_token_sender(logger, config, private_keys, recipient_addresses, is_retry=False):
+async def run_token_sender(logger, settings, private_keys, recipient_addresses, is_retry=False, plan=None, profiler=None):
     """Запускает отправку токенов"""
     try:
         if is_retry:
             logger.info(f"🔄 Повторный запуск для {len(private_keys)} неудачных аккаунтов")
+        elif plan is not None:
+            logger.info(f"📋 Запуск по плану для {len(plan['entries'])} аккаунтов")
         else:
             logger.info(f"🚀 Первичный запуск для {len(private_keys)} аккаунтов")
         
         # Создаем экземпляр TokenSender
-        token_sender = TokenSender(config, logger)
+        token_sender = TokenSender(settings, logger)
         
-        # Запускаем процесс отправки токенов
-        await token_sender.process_transfers(private_keys, recipient_addresses)
+        # Запускаем процесс отправки токенов (с --profile профилируется только он, без ожидания ввода)
+        with profile_section(profiler):
+            if plan is not None:
+                await token_sender.process_plan(plan, private_keys)
+            elif settings.execution.shards > 1:
+                # Каждый шард - отдельный процесс; статистика объединяется в token_sender
+                await ShardedRunner(settings, logger, token_sender).run(private_keys, recipient_addresses)
+            else:
+                await token_sender.process_transfers(private_keys, recipient_addresses)
         
         return token_sender.stats
         
@@ -153,7 +267,7 @@ async def run_token_sender(logger, config, private_keys, recipient_addresses, is
         logger.error(f"Критическая ошибка: {str(e)}")
         return None
 
-async def main():
+async def main(profiler=None):
     """Основная функция с постоянным интерактивным меню"""
     print_header()
     
@@ -161,19 +275,37 @@ async def main():
     logger = setup_logger()
     
     try:
-        # Загружаем конфигурацию
-        config = load_config()
+        # Загружаем и проверяем конфигурацию (ошибки видны сразу, а не посреди работы)
+        settings = load_settings()
         logger.info("Конфигурация успешно загружена")
         
         # Главный цикл меню
+        plan = None
         while True:
             menu_choice = show_startup_menu()
             
             if menu_choice == "exit":
                 return
             elif menu_choice == "gas_info":
-                show_gas_info(config)
+                show_gas_info(settings)
                 continue  # Автоматически возвращаемся в меню
+            elif menu_choice == "watch":
+                await run_deposit_watcher(logger, settings, profiler)
+                return
+            elif menu_choice == "plan":
+                build_transfer_plan(logger, settings)
+                continue
+            elif menu_choice == "reconcile":
+                reconcile_results(logger, settings, ask_journal_file())
+                continue
+            elif menu_choice == "run_plan":
+                plan_file = ask_plan_file()
+                if not plan_file:
+                    print(f"{Colors.RED}❌ Сохраненный план не найден{Colors.RESET}")
+                    continue
+                plan = load_plan(plan_file)
+                logger.info(f"📋 Загружен план {plan_file}")
+                break
             elif menu_choice == "start":
                 break
         
@@ -184,7 +316,8 @@ async def main():
         logger.info(f"Загружено {len(all_private_keys)} приватных ключей и {len(all_recipient_addresses)} адресов получателей")
         
         # Первый запуск
-        stats = await run_token_sender(logger, config, all_private_keys, all_recipient_addresses, is_retry=False)
+        stats = await run_token_sender(logger, settings, all_private_keys, all_recipient_addresses, is_retry=False, plan=plan,
+                                       profiler=profiler)
         
         if stats is None:
             logger.error("❌ Не удалось выполнить отправку токенов")
@@ -204,6 +337,11 @@ async def main():
             logger.info("✅ Программа завершена успешно")
             return
         
+        # Повторы уже выполнены очередью внутри TokenSender - меню не нужно
+        if settings.execution.retry_queue.enabled:
+            logger.warning(f"⚠️ После автоматических повторов остались необработанные аккаунты: {total_failed}/{total_accounts}")
+            return
+        
         # Если есть неудачные - всегда предлагаем повтор
         if show_retry_menu(failed_accounts, skipped_accounts):
             # Получаем данные для неудачных аккаунтов
@@ -216,7 +354,7 @@ async def main():
                 
                 # Повторный запуск
                 retry_stats = await run_token_sender(
-                    logger, config, failed_private_keys, failed_recipient_addresses, is_retry=True
+                    logger, settings, failed_private_keys, failed_recipient_addresses, is_retry=True, profiler=profiler
                 )
                 
                 if retry_stats:
@@ -243,6 +381,9 @@ async def main():
     except FileNotFoundError as e:
         logger.error(f"Ошибка при загрузке файлов: {str(e)}")
         print(f"{Colors.RED}❌ Проверьте наличие необходимых файлов{Colors.RESET}")
+    except ValueError as e:
+        logger.error(str(e))
+        print(f"{Colors.RED}❌ Проверьте config.yaml и файлы данных{Colors.RESET}")
     except ConnectionError as e:
         logger.error(f"Ошибка подключения: {str(e)}")
         print(f"{Colors.RED}❌ Проверьте подключение к интернету и RPC{Colors.RESET}")
@@ -254,8 +395,32 @@ async def main():
     print(f"{Colors.CYAN}{'=' * 60}{Colors.RESET}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETH Token Sender v2.1")
+    parser.add_argument("--profile", action="store_true",
+                        help="Профилировать обработку без ожидания ввода в меню (yappi, если установлен, иначе cProfile) и сохранить pstat файл в results/")
+    parser.add_argument("--reconcile", nargs="?", const="", metavar="FILE",
+                        help="Сверить журнал результатов (по умолчанию последний results/outcomes_*.jsonl) с сетью и выйти")
+    parser.add_argument("--convert-keys", action="store_true",
+                        help="Конвертировать data/private_keys.txt в бинарное хранилище data/private_keys.bin и выйти")
+    parser.add_argument("--bench-transport", nargs="?", type=int, const=500, metavar="CALLS",
+                        help="Сравнить стандартный и облегченный RPC транспорт на RPC из конфига (по умолчанию 500 вызовов) и выйти")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        if args.bench_transport:
+            run_transport_benchmark(setup_logger(), load_settings(), args.bench_transport)
+        elif args.convert_keys:
+            convert_private_keys(setup_logger())
+        elif args.reconcile is not None:
+            reconcile_results(setup_logger(), load_settings(), args.reconcile or find_latest_journal())
+        elif args.profile:
+            profiler = RunProfiler()
+            try:
+                asyncio.run(main(profiler))
+            finally:
+                profiler.save()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print(f"\n{Colors.RED}👋 Программа прервана пользователем{Colors.RESET}")
     except Exception as e:
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .transport import make_web3
+
+
+class BlockCache:
+    """Сквозной кэш чтений состояния сети с ключом по номеру блока.
+
+    Каждое значение запоминается вместе с блоком, на котором оно прочитано, и
+    сбрасывается при появлении нового блока, поэтому повторные чтения в пределах
+    блока бесплатны, а данные старого блока не используются. Размер ограничен
+    (LRU). Неизменяемые значения (chain_id) хранятся до конца процесса.
+    """
+
+    def __init__(self, w3, max_entries=4096, head_check_interval=1.0):
+        self.w3 = w3
+        self.max_entries = max_entries
+        self.head_check_interval = head_check_interval
+
+        self._entries = OrderedDict()
+        self._static = {}
+        self._head = None
+        self._head_checked_at = None
+        # Чтения выполняются из пула потоков (run_in_executor)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def head(self, fresh=False):
+        """Текущий номер блока; узел опрашивается не чаще head_check_interval секунд"""
+        now = time.monotonic()
+        with self._lock:
+            if (not fresh and self._head is not None and
+                    now - self._head_checked_at < self.head_check_interval):
+                return self._head
+
+        block_number = self.w3.eth.block_number
+        self.observe_block(block_number)
+        return self._head
+
+    def observe_block(self, block_number):
+        """Сообщает о новом блоке (например, из receipt): кэш прошлых блоков сбрасывается"""
+        with self._lock:
+            self._head_checked_at = time.monotonic()
+            if self._head is None or block_number > self._head:
+                self._head = block_number
+                self._entries.clear()
+
+    def get(self, method, args, fetch, fresh=False):
+        """Возвращает значение для (method, args) на текущем блоке, вызывая fetch(block) при промахе"""
+        block_number = self.head(fresh)
+        key = (block_number, method, args)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = fetch(block_number)
+
+        with self._lock:
+            # Пока шел запрос мог прийти новый блок - тогда значение уже устарело
+            if block_number == self._head:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def gas_price(self, fresh=False):
+        """Цена газа в wei на текущем блоке"""
+        return self.get('eth_gasPrice', (), lambda block: self.w3.eth.gas_price, fresh)
+
+    def get_balance(self, address, fresh=False):
+        """Баланс адреса в wei, прочитанный на текущем блоке"""
+        return self.get('eth_getBalance', (address,),
+                        lambda block: self.w3.eth.get_balance(address, block_identifier=block), fresh)
+
+    def get_transaction_count(self, address, fresh=False):
+        """Nonce адреса, прочитанный на текущем блоке"""
+        return self.get('eth_getTransactionCount', (address,),
+                        lambda block: self.w3.eth.get_transaction_count(address, block_identifier=block), fresh)
+
+    def base_fee(self, fresh=False):
+        """base fee текущего блока в wei (None для сетей без EIP-1559)"""
+        return self.get('baseFeePerGas', (),
+                        lambda block: self.w3.eth.get_block(block).get('baseFeePerGas'), fresh)
+
+    def chain_id(self):
+        """chain_id сети (не меняется, кэшируется на весь процесс)"""
+        if 'chain_id' not in self._static:
+            self._static['chain_id'] = self.w3.eth.chain_id
+        return self._static['chain_id']
+
+
+_caches = {}
+
+
+def get_block_cache(settings, w3=None):
+    """Возвращает общий для процесса кэш чтений для RPC из настроек (создается один раз)"""
+    network = settings.network
+    cache = _caches.get(network.rpc_url)
+    if cache is None:
+        if w3 is None:
+            w3 = make_web3(settings)
+        cache = BlockCache(w3, max_entries=network.cache_size, head_check_interval=network.head_check_interval)
+        _caches[network.rpc_url] = cache
+    return cache
\ No newline at end of file
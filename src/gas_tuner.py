@@ -0,0 +1,140 @@
+import json
+import os
+from datetime import datetime
+
+
+class GasTuner:
+    """Подстраивает множитель цены газа по фактической задержке включения транзакций.
+
+    Для каждой подтвержденной транзакции запоминается предложенная цена относительно
+    base fee и число блоков от отправки до включения; транзакция без receipt за время
+    ожидания считается промахом с задержкой больше целевой. Раз в window транзакций
+    множитель повышается на step, если средняя задержка больше целевой, и осторожно
+    снижается (на step / 2), если транзакции укладываются в цель. Выученный множитель
+    сохраняется в state_file отдельно для каждого chain_id.
+    """
+
+    def __init__(self, tuner_settings, chain_id, initial_multiplier, logger):
+        self.settings = tuner_settings
+        self.chain_id = chain_id
+        self.logger = logger
+        self.initial_multiplier = initial_multiplier
+
+        learned = self._load_state().get(str(chain_id), {}).get('multiplier')
+        self.multiplier = self._clamp(learned if learned is not None else initial_multiplier)
+        self.start_multiplier = self.multiplier
+        if learned is not None:
+            self.logger.info(f"🎛️ Множитель газа для chain_id {chain_id} из прошлых запусков: {self.multiplier:.3f}")
+
+        self._window = []
+        self.observations = 0
+        self.total_delay = 0
+        self.fee_saved_wei = 0
+        self.decisions = []
+
+    def _clamp(self, multiplier):
+        return min(max(multiplier, self.settings.min_multiplier), self.settings.max_multiplier)
+
+    def _load_state(self):
+        try:
+            with open(self.settings.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def observe(self, multiplier, gas_price, gas_used, base_fee, submitted_block, included_block):
+        """Учитывает подтвержденную транзакцию: цену, base fee блока отправки и задержку в блоках"""
+        delay = max(included_block - submitted_block, 0)
+        offered_ratio = gas_price / base_fee if base_fee else None
+        self._window.append((delay, offered_ratio))
+        self.observations += 1
+        self.total_delay += delay
+
+        # Экономия относительно статического множителя из конфига при той же цене сети
+        network_price = gas_price / multiplier
+        self.fee_saved_wei += int(network_price * (self.initial_multiplier - multiplier) * gas_used)
+
+        if len(self._window) >= self.settings.window:
+            self._adjust()
+
+    def observe_miss(self, delay):
+        """Учитывает транзакцию без receipt за время ожидания: задержка не меньше целевой плюс один блок"""
+        delay = max(delay, self.settings.target_blocks + 1)
+        self._window.append((delay, None))
+        self.observations += 1
+        self.total_delay += delay
+
+        if len(self._window) >= self.settings.window:
+            self._adjust()
+
+    def _adjust(self):
+        """Корректирует множитель по средней задержке последнего окна"""
+        delays = [delay for delay, _ in self._window]
+        ratios = [ratio for _, ratio in self._window if ratio is not None]
+        mean_delay = sum(delays) / len(delays)
+        self._window = []
+
+        step = self.settings.step
+        if mean_delay > self.settings.target_blocks:
+            new_multiplier = self._clamp(self.multiplier * (1 + step))
+        else:
+            new_multiplier = self._clamp(self.multiplier * (1 - step / 2))
+        if new_multiplier == self.multiplier:
+            return
+
+        self.decisions.append({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'samples': len(delays),
+            'mean_delay_blocks': mean_delay,
+            'mean_offered_to_base_fee': sum(ratios) / len(ratios) if ratios else None,
+            'from': self.multiplier,
+            'to': new_multiplier
+        })
+        self.logger.info(f"🎛️ Множитель газа {self.multiplier:.3f} → {new_multiplier:.3f}: средняя задержка "
+                         f"{mean_delay:.2f} блока при цели {self.settings.target_blocks}")
+        self.multiplier = new_multiplier
+
+    def merge_shards(self, summaries):
+        """Объединяет автонастройку шардов: множитель - среднее множителей шардов с весом по числу наблюдений"""
+        observed = [(shard_index, summary) for shard_index, summary in summaries if summary['observations']]
+        if not observed:
+            return
+        total = sum(summary['observations'] for _, summary in observed)
+        self.multiplier = self._clamp(sum(summary['final_multiplier'] * summary['observations'] for _, summary in observed) / total)
+        self.observations += total
+        self.total_delay += sum(summary['mean_delay_blocks'] * summary['observations'] for _, summary in observed)
+        self.fee_saved_wei += sum(summary['fee_saved_wei'] for _, summary in observed)
+        for shard_index, summary in observed:
+            self.decisions.extend(dict(decision, shard=shard_index) for decision in summary['decisions'])
+        self.decisions.sort(key=lambda decision: decision['time'])
+
+    def save(self):
+        """Сохраняет выученный множитель для chain_id (запись через временный файл)"""
+        if not self.observations:
+            return
+        state = self._load_state()
+        state[str(self.chain_id)] = {
+            'multiplier': self.multiplier,
+            'observations': self.observations,
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        directory = os.path.dirname(self.settings.state_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.settings.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.settings.state_file)
+
+    def summary(self):
+        """Решения и итоги автонастройки для статистики запуска"""
+        return {
+            'chain_id': self.chain_id,
+            'start_multiplier': self.start_multiplier,
+            'final_multiplier': self.multiplier,
+            'static_multiplier': self.initial_multiplier,
+            'observations': self.observations,
+            'mean_delay_blocks': self.total_delay / self.observations if self.observations else None,
+            'fee_saved_wei': self.fee_saved_wei,
+            'decisions': self.decisions
+        }
\ No newline at end of file
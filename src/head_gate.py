@@ -0,0 +1,99 @@
+import asyncio
+
+
+class HeadGate:
+    """Выпускает подписанные транзакции сразу после появления нового блока.
+
+    Фоновая задача часто опрашивает номер блока. Транзакция отправляется без ожидания,
+    если новый блок появился не позднее release_window секунд назад, иначе удерживается
+    до следующего блока (но не дольше max_hold секунд), чтобы успеть в следующий блок,
+    а не попасть в конец слота и потерять блок ожидания.
+    """
+
+    def __init__(self, sender, block_settings):
+        self.sender = sender
+        self.logger = sender.logger
+        self.poll_interval = block_settings.poll_interval
+        self.release_window = block_settings.release_window
+        self.max_hold = block_settings.max_hold
+
+        self.head = None
+        self._head_seen_at = None
+        self._first_head = None
+        self._new_head = None
+        self._poller = None
+
+        self.held = 0
+        self.hold_time = 0.0
+        self.timeouts = 0
+
+    def _ensure_polling(self):
+        if self._poller is None or self._poller.done():
+            self._first_head = asyncio.Event()
+            self._new_head = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        """Опрашивает номер блока и будит ожидающие транзакции при каждом новом блоке"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                block_number = await self.sender._run_blocking(self.sender.cache.head, True)
+            except Exception as e:
+                self.logger.warning(f"Не удалось получить номер блока: {str(e)}")
+                block_number = None
+
+            if block_number is not None:
+                if self.head is None:
+                    # Возраст первого увиденного блока неизвестен - ждем следующий
+                    self.head = block_number
+                    self._first_head.set()
+                elif block_number > self.head:
+                    self.head = block_number
+                    self._head_seen_at = loop.time()
+                    self._new_head.set()
+                    self._new_head = asyncio.Event()
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for_release(self, account_id):
+        """Ждет момента отправки; возвращает номер блока, после которого транзакция выпущена"""
+        self._ensure_polling()
+        loop = asyncio.get_running_loop()
+        if not self._first_head.is_set():
+            try:
+                await asyncio.wait_for(self._first_head.wait(), self.max_hold)
+            except asyncio.TimeoutError:
+                # Номер блока не читается (RPC недоступен) - удержание не должно быть бесконечным
+                self.timeouts += 1
+                self.logger.warning(f"[Аккаунт {account_id}] Номер блока не получен за {self.max_hold} секунд, "
+                                    f"отправляем без выравнивания")
+                return self.head
+
+        if self._head_seen_at is not None and loop.time() - self._head_seen_at <= self.release_window:
+            return self.head
+
+        started = loop.time()
+        start_head = self.head
+        self.logger.info(f"[Аккаунт {account_id}] 🧱 Транзакция удерживается до следующего блока (текущий {start_head})")
+        try:
+            while self.head <= start_head:
+                await asyncio.wait_for(self._new_head.wait(), self.max_hold - (loop.time() - started))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.logger.warning(f"[Аккаунт {account_id}] Новый блок не появился за {self.max_hold} секунд, отправляем без выравнивания")
+        finally:
+            self.held += 1
+            self.hold_time += loop.time() - started
+        return self.head
+
+    def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    def summary(self):
+        return {
+            'held': self.held,
+            'mean_hold_seconds': self.hold_time / self.held if self.held else 0.0,
+            'timeouts': self.timeouts
+        }
\ No newline at end of file
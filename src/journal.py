@@ -0,0 +1,61 @@
+import json
+import os
+from datetime import datetime
+
+
+class ResultsJournal:
+    """Журнал результатов: каждая попытка аккаунта дописывается в JSONL файл сразу.
+
+    Файл создается при первой записи. Каждая строка пишется одним системным вызовом
+    в режиме O_APPEND, поэтому в один журнал могут писать и процессы-шарды.
+    """
+
+    def __init__(self, path=None, results_dir="results"):
+        if path is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            path = f"{results_dir}/outcomes_{timestamp}.jsonl"
+        self.path = path
+        self.records = 0
+        self._fd = None
+
+    def write(self, status, entry, **fields):
+        """Дописывает в журнал результат аккаунта (success, failed или skipped)"""
+        if self._fd is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+        record = {'time': datetime.now().isoformat(timespec='seconds'), 'status': status}
+        record.update(entry)
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        os.write(self._fd, line.encode('utf-8'))
+        self.records += 1
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def iter_journal(path):
+    """Построчно читает журнал, не загружая файл целиком (битые строки пропускаются)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def find_latest_journal(results_dir="results"):
+    """Возвращает путь к последнему журналу результатов или None"""
+    if not os.path.exists(results_dir):
+        return None
+
+    journals = sorted(name for name in os.listdir(results_dir) if name.startswith("outcomes_") and name.endswith(".jsonl"))
+    return f"{results_dir}/{journals[-1]}" if journals else None
\ No newline at end of file
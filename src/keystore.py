@@ -0,0 +1,103 @@
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from eth_account import Account
+from web3 import Web3
+
+# Заголовок: сигнатура формата и число записей
+MAGIC = b"ETHKEYS1"
+HEADER = struct.Struct("<8sQ")
+KEY_SIZE = 32
+ADDRESS_SIZE = 20
+RECORD_SIZE = KEY_SIZE + ADDRESS_SIZE
+
+
+class KeyStore(Sequence):
+    """Бинарное хранилище ключей: записи фиксированной длины (32 байта ключа + 20 байт адреса).
+
+    Файл отображается в память (mmap), поэтому открытие не зависит от числа ключей,
+    а ключ и адрес по индексу читаются срезом без разбора текста. Ведет себя как
+    список приватных ключей в hex, срез возвращает представление того же файла.
+    """
+
+    def __init__(self, path, _mmap=None, _start=0, _stop=None):
+        self.path = path
+        if _mmap is None:
+            with open(path, 'rb') as f:
+                _mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count = HEADER.unpack_from(_mmap, 0)
+            if magic != MAGIC:
+                _mmap.close()
+                raise ValueError(f"Файл {path} не является хранилищем ключей")
+            if len(_mmap) < HEADER.size + count * RECORD_SIZE:
+                _mmap.close()
+                raise ValueError(f"Хранилище ключей {path} повреждено: ожидалось {count} записей")
+            _stop = count
+        self._mmap = _mmap
+        self._start = _start
+        self._stop = _stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def _offset(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("индекс ключа вне диапазона")
+        return HEADER.size + (self._start + index) * RECORD_SIZE
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return KeyStore(self.path, self._mmap, self._start + start, self._start + max(start, stop))
+
+        offset = self._offset(index)
+        return '0x' + self._mmap[offset:offset + KEY_SIZE].hex()
+
+    def address(self, index):
+        """Адрес отправителя по индексу, сохраненный при конвертации (без вычисления ECDSA)"""
+        offset = self._offset(index) + KEY_SIZE
+        return Web3.to_checksum_address(self._mmap[offset:offset + ADDRESS_SIZE])
+
+    def addresses(self):
+        return [self.address(index) for index in range(len(self))]
+
+
+def stored_address(private_keys, index):
+    """Адрес ключа из хранилища; None, если ключи загружены из текстового файла"""
+    if isinstance(private_keys, KeyStore):
+        return private_keys.address(index)
+    return None
+
+
+def derive_addresses(private_keys):
+    """Адреса всех ключей: из хранилища без вычислений, иначе через Account.from_key"""
+    if isinstance(private_keys, KeyStore):
+        return private_keys.addresses()
+    return [Account.from_key(key).address for key in private_keys]
+
+
+def convert_keys_to_store(private_keys, store_path):
+    """Однократно записывает ключи и их адреса в бинарное хранилище, возвращает число записей.
+
+    Файл пишется во временный и подменяется атомарно, чтобы прерванная конвертация
+    не оставила поврежденное хранилище. Файл создается с правами 0600: ключи не должны
+    быть доступны другим пользователям ни в какой момент.
+    """
+    tmp_path = f"{store_path}.tmp"
+    # Права задаются только при создании - оставшийся от прерванной конвертации файл удаляем
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(private_keys)))
+        for key in private_keys:
+            key_bytes = bytes.fromhex(key[2:] if key.startswith('0x') else key)
+            address = Account.from_key(key_bytes).address
+            f.write(key_bytes + bytes.fromhex(address[2:]))
+    os.replace(tmp_path, store_path)
+    return len(private_keys)
\ No newline at end of file
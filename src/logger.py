@@ -70,8 +70,8 @@ def create_clickable_link(url, text=None, color=Colors.BRIGHT_GREEN):
     # Используем ANSI escape последовательности для создания кликабельной ссылки
     return f"{color}{Colors.UNDERLINE}\033]8;;{url}\033\\{text}\033]8;;\033\\{Colors.RESET}"
 
-def setup_logger():
-    """Настраивает логгер с цветным выводом"""
+def setup_logger(shard=None):
+    """Настраивает логгер с цветным выводом (shard - номер процесса-шарда многопроцессного запуска)"""
     # Создаем директорию для логов
     logs_dir = "logs"
     if not os.path.exists(logs_dir):
@@ -79,6 +79,8 @@ def setup_logger():
     
     # Настраиваем формат логирования
     log_format = "%(asctime)s - %(levelname)s - %(message)s"
+    if shard is not None:
+        log_format = f"%(asctime)s - %(levelname)s - [Шард {shard}] %(message)s"
     date_format = "%Y-%m-%d %H:%M:%S"
     
     # Создаем логгер
@@ -94,8 +96,9 @@ def setup_logger():
     
     # Создаем обработчик для файла (без цветов)
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    shard_suffix = f"_shard{shard}" if shard is not None else ""
     file_handler = logging.FileHandler(
-        f"{logs_dir}/eth_sender_{current_time}.log",
+        f"{logs_dir}/eth_sender_{current_time}{shard_suffix}.log",
         encoding='utf-8'
     )
     file_handler.setLevel(logging.INFO)
@@ -0,0 +1,442 @@
+import asyncio
+import random
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from eth_account import Account
+
+from .keystore import stored_address
+from .rpc import BatchRPC
+
+
+class AccountRows(Sequence):
+    """Строки аккаунтов, которые создаются по требованию из последовательностей ключей и получателей.
+
+    Словарь строки создается только при обращении к ней, поэтому для всего списка в памяти
+    остаются лишь ключи (список или KeyStore), адреса получателей и порядок обхода.
+    """
+
+    def __init__(self, private_keys, recipient_addresses, order=None):
+        self.private_keys = private_keys
+        self.recipient_addresses = recipient_addresses
+        self.order = order
+
+    def __len__(self):
+        return len(self.private_keys)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        index = self.order[position] if self.order is not None else range(len(self))[position]
+        return self.row(index)
+
+    def row(self, index):
+        """Строка по индексу в файлах (account_id = index + 1)"""
+        return {
+            'account_id': index + 1,
+            'private_key': self.private_keys[index],
+            'to': self.recipient_addresses[index],
+            'address': stored_address(self.private_keys, index)
+        }
+
+    def shuffled(self):
+        """Те же строки в случайном порядке (перемешивается только массив индексов)"""
+        order = array('L', range(len(self)))
+        random.shuffle(order)
+        return AccountRows(self.private_keys, self.recipient_addresses, order)
+
+    def by_id(self):
+        """Отображение account_id -> строка для очереди повторов"""
+        return _RowsById(self)
+
+
+class _RowsById(Mapping):
+    """Доступ к строкам AccountRows по account_id без хранения словарей строк"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __contains__(self, account_id):
+        return isinstance(account_id, int) and 1 <= account_id <= len(self.rows)
+
+    def __getitem__(self, account_id):
+        if account_id not in self:
+            raise KeyError(account_id)
+        return self.rows.row(account_id - 1)
+
+    def __iter__(self):
+        return iter(range(1, len(self.rows) + 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class PipelineStage:
+    """Этап конвейера: ограниченная входная очередь и собственный пул обработчиков"""
+
+    def __init__(self, name, handler, workers, queue_size, batch_size=1, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.next_stage = None
+
+        self.processed = 0
+        self.max_depth = 0
+        self.busy_time = 0.0
+        self._tasks = []
+
+    async def put(self, state):
+        """Кладет элемент в очередь этапа; ждет, если очередь заполнена (обратное давление)"""
+        await self.queue.put(state)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Дожидается обработки всех элементов очереди и останавливает обработчики"""
+        await self.queue.join()
+        self.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _work(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Пакетный этап забирает все, что уже накопилось в очереди (до batch_size)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            started = time.perf_counter()
+            try:
+                results = await self.handler(batch if self.batch_size > 1 else batch[0])
+                if self.batch_size == 1:
+                    results = [results]
+                for result in results:
+                    if result is not None and self.next_stage is not None:
+                        await self.next_stage.put(result)
+            except Exception as e:
+                # Ошибка одного элемента не должна останавливать обработчик этапа
+                if self.on_error is not None:
+                    self.on_error(self.name, batch, e)
+            finally:
+                self.busy_time += time.perf_counter() - started
+                self.processed += len(batch)
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class TransferPipeline:
+    """Конвейерный запуск для очень больших списков аккаунтов.
+
+    Аккаунты проходят этапы загрузка → адрес → чтение состояния → план → подпись →
+    отправка → подтверждение → запись, связанные ограниченными очередями asyncio.
+    У каждого этапа свой лимит параллельности, а медленный этап сдерживает быстрые
+    вместо накопления данных. Состояние аккаунтов существует только в очередях; при
+    запуске с AccountRows на весь список в памяти хранятся ключи, адреса получателей,
+    хэши ключей для поиска повторов и записи об исходах в статистике (по одной на аккаунт).
+    Замеры фаз копятся только агрегатами (PhaseTimer в режиме aggregate), их объем ограничен.
+    """
+
+    def __init__(self, sender, rpc=None):
+        self.sender = sender
+        self.logger = sender.logger
+        self.settings = sender.settings
+        self.pipeline_settings = self.settings.execution.pipeline
+        self.rpc = rpc or BatchRPC(
+            self.settings.network.rpc_url,
+            batch_size=self.settings.network.batch_size
+        )
+
+        workers = self.pipeline_settings.workers
+        queue_size = self.pipeline_settings.queue_size
+        self.stages = [
+            PipelineStage('derive', self._derive, workers.derive, queue_size, on_error=self._stage_error),
+            PipelineStage('prefetch', self._prefetch, workers.prefetch, queue_size,
+                          batch_size=self.settings.network.batch_size, on_error=self._stage_error),
+            PipelineStage('plan', self._plan, workers.plan, queue_size, on_error=self._stage_error),
+            PipelineStage('sign', self._sign, workers.sign, queue_size, on_error=self._stage_error),
+            PipelineStage('broadcast', self._broadcast, workers.broadcast, queue_size, on_error=self._stage_error),
+            PipelineStage('confirm', self._confirm, workers.confirm, queue_size, on_error=self._stage_error),
+            PipelineStage('record', self._record, 1, queue_size, on_error=self._stage_error)
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+
+        self.loaded = 0
+        self.started_at = None
+
+    async def run(self, accounts):
+        """Прогоняет аккаунты через все этапы и возвращает сводку по этапам"""
+        self.started_at = time.perf_counter()
+        self.logger.info(f"🏭 Конвейерный режим: очереди по {self.pipeline_settings.queue_size}, обработчики "
+                         + ", ".join(f"{stage.name}={stage.workers}" for stage in self.stages))
+
+        for stage in self.stages:
+            stage.start()
+        reporter = asyncio.create_task(self._report_progress())
+
+        try:
+            # Этап загрузки: строки одного ключа объединяются в цепочку (без вычисления адресов)
+            for state in self._load(accounts):
+                await self.stages[0].put(state)
+                self.loaded += 1
+
+            # Этапы останавливаются по порядку, когда предыдущий уже ничего не передаст
+            for stage in self.stages:
+                await stage.stop()
+        finally:
+            reporter.cancel()
+            for stage in self.stages:
+                stage.cancel()
+
+        summary = self.summarize()
+        self.sender.stats['pipeline'] = summary
+        log_pipeline_summary(self.logger, summary)
+        return summary
+
+    @staticmethod
+    def _find_repeated(accounts):
+        """Предварительный проход: строки ключей, встречающихся больше одного раза.
+
+        Для всех строк хранится только хэш ключа; строки сохраняются лишь для ключей,
+        хэш которых повторился (совпадения хэшей разных ключей отбрасываются).
+        """
+        seen = set()
+        repeated_hashes = set()
+        for item in accounts:
+            key_hash = hash(_normalize_key(item['private_key']))
+            if key_hash in seen:
+                repeated_hashes.add(key_hash)
+            seen.add(key_hash)
+        seen.clear()
+
+        groups = {}
+        if repeated_hashes:
+            for item in accounts:
+                key = _normalize_key(item['private_key'])
+                if hash(key) in repeated_hashes:
+                    groups.setdefault(key, []).append(item)
+        return {key: items for key, items in groups.items() if len(items) > 1}
+
+    def _load(self, accounts):
+        """Загрузка: отдает состояния аккаунтов по одному, объединяя строки повторяющегося ключа в цепочку"""
+        repeated = self._find_repeated(accounts)
+
+        for item in accounts:
+            items = [item]
+            if repeated:
+                key = _normalize_key(item['private_key'])
+                if key in repeated:
+                    # Цепочка отдается на первой строке ключа, остальные строки уже в ней
+                    items = repeated[key]
+                    if items is None:
+                        continue
+                    repeated[key] = None
+            state = {
+                'source': items[0],
+                'account_id': items[0]['account_id'],
+                'private_key': items[0]['private_key'],
+                'to': items[0]['to'],
+                'address': items[0].get('address'),
+                'balance': items[0].get('balance'),
+                'nonce': items[0].get('nonce'),
+                'amount': items[0].get('amount')
+            }
+            if len(items) > 1:
+                state['chain'] = [{'account_id': item['account_id'], 'to': item['to']} for item in items]
+                state['chain_items'] = items
+            yield state
+
+    def _stage_error(self, stage_name, batch, error):
+        """Фиксирует неудачу аккаунтов, на которых этап завершился исключением"""
+        for state in batch:
+            for link in state.get('chain', [state]):
+                self.sender._record_failure(link['account_id'], state['address'],
+                                            f"Ошибка на этапе {stage_name}: {str(error)}")
+
+    async def _derive(self, state):
+        """Вычисляет адрес отправителя (ECDSA) в пуле потоков"""
+        if not state['address']:
+            state['address'] = await self.sender._run_blocking(
+                lambda: Account.from_key(state['private_key']).address
+            )
+        # Адрес нужен и очереди повторов
+        for item in state.get('chain_items', [state['source']]):
+            item['address'] = state['address']
+
+        if 'chain' in state and state['address'] not in self.sender._reported_duplicates:
+            self.sender._reported_duplicates.add(state['address'])
+            self.logger.warning(f"👥 Отправитель {state['address']} повторяется в строках "
+                                f"{', '.join(str(link['account_id']) for link in state['chain'])}: "
+                                f"переводы пойдут одной цепочкой nonce с разделением баланса")
+        return state
+
+    async def _prefetch(self, batch):
+        """Пакетно читает балансы и nonce пачки аккаунтов на одном блоке"""
+        to_read = [state for state in batch if state['balance'] is None]
+        if to_read:
+            addresses = [state['address'] for state in to_read]
+            try:
+                block = await self.sender._run_blocking(self.rpc.get_block_number)
+                balances = await self.sender._run_blocking(self.rpc.get_balances, addresses, block)
+                nonces = await self.sender._run_blocking(self.rpc.get_nonces, addresses, block)
+            except Exception as e:
+                # Состояние прочитается по одному аккаунту на следующих этапах
+                self.logger.warning(f"Не удалось пакетно прочитать состояние {len(to_read)} аккаунтов: {str(e)}")
+                balances = nonces = [None] * len(to_read)
+
+            for state, balance, nonce in zip(to_read, balances, nonces):
+                state['balance'] = balance
+                state['nonce'] = nonce
+        return batch
+
+    async def _plan(self, state):
+        """Проверяет минимальный баланс и ждет приемлемую цену газа"""
+        if 'chain' in state:
+            # Цепочка повторяющегося отправителя выполняется целиком по отдельной логике
+            await self.sender.send_chain(state)
+            return None
+
+        balance = await self.sender._check_balance_and_gas(state['address'], state['account_id'], state['balance'])
+        if balance is False or balance == "skipped":
+            return None
+        state['balance'] = balance
+        return state
+
+    async def _sign(self, state):
+        """Рассчитывает сумму и подписывает транзакцию"""
+        built = await self.sender._run_blocking(
+            self.sender._build_transaction, state['private_key'], state['address'], state['to'],
+            state['balance'], state['account_id'], 1, state['nonce'], True, state['amount']
+        )
+        if built is False:
+            return None
+        state['built'] = built
+        return state
+
+    async def _broadcast(self, state):
+        """Отправляет подписанную транзакцию и выдерживает настроенную задержку между отправками"""
+        account_id = state['account_id']
+        if self.sender.head_gate is not None:
+            built = await self.sender._release_on_new_head(state['private_key'], state['address'], state['to'],
+                                                           account_id, state['balance'], state['built'])
+            if built is False:
+                return None
+            state['built'] = built
+        state['submitted'] = await self.sender._submission_point()
+        try:
+            with self.sender.timings.phase(account_id, 'broadcast'):
+                state['tx_hash'] = await self.sender._run_blocking(
+                    self.sender.w3.eth.send_raw_transaction, state['built']['signed_tx'].rawTransaction
+                )
+            self.logger.info(f"[Аккаунт {account_id}] Транзакция отправлена: {state['tx_hash'].hex()}")
+        except Exception as e:
+            state['tx_hash'] = None
+            state['error'] = str(e)
+
+        delay = self.sender.get_random_delay()
+        if delay > 0:
+            self.sender.stats['total_delay_time'] += delay
+            with self.sender.timings.phase(account_id, 'delay'):
+                await asyncio.sleep(delay)
+        return state
+
+    async def _confirm(self, state):
+        """Ждет receipt; неудачные отправки уходят в обычную логику повторных попыток"""
+        account_id = state['account_id']
+        if state['tx_hash'] is not None:
+            try:
+                receipt = await self.sender._wait_for_receipt(account_id, state['tx_hash'], state['built'], state['submitted'])
+                self.sender.cache.observe_block(receipt['blockNumber'])
+                if receipt['status'] == 1:
+                    self.sender._observe_inclusion(state['built'], state['submitted'], receipt)
+                    state['receipt'] = receipt
+                    return state
+                state['error'] = f"Транзакция не удалась: {state['tx_hash'].hex()}"
+            except Exception as e:
+                state['error'] = str(e)
+
+        if "insufficient funds" in state['error'].lower():
+            self.sender._record_failure(account_id, state['address'], "Недостаточно средств для транзакции",
+                                        "Недостаточно средств", retryable=False)
+            return None
+
+        self.logger.warning(f"[Аккаунт {account_id}] {state['error']}. Повторяем отправку")
+        await self.sender._send_with_retries(
+            state['private_key'], state['address'], state['to'], account_id, state['balance']
+        )
+        return None
+
+    async def _record(self, state):
+        """Записывает подтвержденную транзакцию в статистику"""
+        built = state['built']
+        fee_wei = built['gas_price'] * built['gas_limit']
+        self.sender._record_success(
+            state['account_id'], state['address'], state['tx_hash'], built['amount_wei'],
+            int(state['receipt'].get('gasUsed', built['gas_limit'])), built['target_remaining'],
+            to_address=state['to'], nonce=built['nonce'], fee_wei=fee_wei,
+            remaining_wei=state['balance'] - built['amount_wei'] - fee_wei
+        )
+        return None
+
+    def summarize(self):
+        """Сводка по этапам: обработано, пропускная способность, глубина очереди, занятость"""
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        return {
+            stage.name: {
+                'processed': stage.processed,
+                'per_second': stage.processed / elapsed,
+                'queue_depth': stage.queue.qsize(),
+                'max_queue_depth': stage.max_depth,
+                'busy_seconds': stage.busy_time
+            }
+            for stage in self.stages
+        }
+
+    async def _report_progress(self):
+        """Периодически выводит глубину очередей и пропускную способность этапов"""
+        interval = self.pipeline_settings.report_interval
+        while True:
+            await asyncio.sleep(interval)
+            summary = self.summarize()
+            self.logger.info(f"🏭 Загружено {self.loaded} | " + " | ".join(
+                f"{name} {row['processed']} ({row['per_second']:.1f}/с, очередь {row['queue_depth']})"
+                for name, row in summary.items()
+            ))
+
+
+
+def log_pipeline_summary(logger, summary):
+    """Выводит итоговую сводку по этапам конвейера"""
+    logger.info("🏭 Этапы конвейера: обработано / в секунду / макс. очередь / занятость (с)")
+    for name, row in summary.items():
+        logger.info(f"   {name:<10} {row['processed']:>8} / {row['per_second']:>8.2f} / "
+                    f"{row['max_queue_depth']:>6} / {row['busy_seconds']:>8.1f}")
+
+
+def merge_pipeline_summaries(merged, summary):
+    """Добавляет сводку конвейера одного процесса к общей.
+
+    Процессы-шарды работают одновременно, поэтому пропускная способность и занятость
+    этапов складываются, а для максимальной глубины очереди берется наибольшая.
+    """
+    for name, row in summary.items():
+        total = merged.setdefault(name, {'processed': 0, 'per_second': 0.0, 'queue_depth': 0,
+                                         'max_queue_depth': 0, 'busy_seconds': 0.0})
+        for key in ('processed', 'per_second', 'queue_depth', 'busy_seconds'):
+            total[key] += row[key]
+        total['max_queue_depth'] = max(total['max_queue_depth'], row['max_queue_depth'])
+    return merged
+
+
+def _normalize_key(private_key):
+    """Приводит приватный ключ к единому виду для поиска повторов без вычисления адреса"""
+    key = private_key.lower()
+    return key[2:] if key.startswith('0x') else key
\ No newline at end of file
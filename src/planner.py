@@ -0,0 +1,204 @@
+import json
+import os
+import random
+from datetime import datetime
+from web3 import Web3
+
+from .keystore import derive_addresses
+from .rpc import BatchRPC
+from .settings import ensure_settings
+from .utils import group_by_sender
+
+
+class TransferPlanner:
+    """Строит план переводов (dry-run) по пакетно прочитанному состоянию сети"""
+
+    def __init__(self, settings, logger, rpc=None):
+        self.settings = ensure_settings(settings)
+        self.logger = logger
+        self.rpc = rpc or BatchRPC(
+            self.settings.network.rpc_url,
+            batch_size=self.settings.network.batch_size
+        )
+
+    def get_plan_gas_price(self):
+        """Возвращает цену газа для плана (та же логика, что и в TokenSender.get_gas_price)"""
+        if self.settings.transaction.use_dynamic_gas:
+            try:
+                gas_price = self.rpc.get_gas_price()
+                multiplier = self.settings.transaction.gas_price_multiplier
+                return int(gas_price * multiplier)
+            except Exception as e:
+                self.logger.warning(f"Не удалось получить динамическую цену газа: {str(e)}. Используем значение из конфига.")
+        return Web3.to_wei(self.settings.transaction.gas_price_gwei, 'gwei')
+
+    def build_plan(self, private_keys, recipient_addresses):
+        """Читает балансы, nonce и код получателей на одном блоке и рассчитывает план за один проход"""
+        if len(private_keys) != len(recipient_addresses):
+            raise ValueError(f"Количество приватных ключей ({len(private_keys)}) не соответствует "
+                             f"количеству адресов получателей ({len(recipient_addresses)})")
+
+        addresses = derive_addresses(private_keys)
+
+        block = self.rpc.get_block_number()
+        gas_price = self.get_plan_gas_price()
+        gas_limit = self.settings.transaction.gas_limit
+        fee = gas_price * gas_limit
+
+        self.logger.info(f"📸 Читаем состояние {len(addresses)} аккаунтов на блоке {block}...")
+        balances = self.rpc.get_balances(addresses, block)
+        nonces = self.rpc.get_nonces(addresses, block)
+        unique_recipients = list(dict.fromkeys(recipient_addresses))
+        codes = dict(zip(unique_recipients, self.rpc.get_codes(unique_recipients, block)))
+
+        balance_check = self.settings.balance_check
+        min_balance_wei = None
+        if balance_check.enabled:
+            min_balance_wei = Web3.to_wei(balance_check.minimum_balance, 'ether')
+        max_fee_ratio = balance_check.max_fee_ratio
+        min_remaining = self.settings.transaction.random_remaining_balance_eth.min
+        max_remaining = self.settings.transaction.random_remaining_balance_eth.max
+
+        entries = []
+        for index, (address, to_address, balance, nonce) in enumerate(
+                zip(addresses, recipient_addresses, balances, nonces)):
+            entry = {
+                'account_id': index + 1,
+                'key_index': index,
+                'address': address,
+                'to': to_address,
+                'balance_wei': balance,
+                'nonce': nonce,
+                'gas_price_wei': gas_price,
+                'fee_wei': fee,
+                'remaining_wei': 0,
+                'amount_wei': 0,
+                'action': 'send',
+                'reason': None,
+                'warning': None
+            }
+
+            code = codes.get(to_address)
+            if balance is None or nonce is None:
+                entry['action'] = 'error'
+                entry['reason'] = "Не удалось прочитать баланс или nonce"
+            elif min_balance_wei is not None and balance < min_balance_wei:
+                entry['action'] = 'skip'
+                entry['reason'] = balance_check.skip_message
+            if code not in (None, '0x', '0x0'):
+                # Обычный запуск код получателя не проверяет, поэтому план только предупреждает,
+                # а набор отправляемых аккаунтов совпадает с запуском без плана
+                entry['warning'] = "Получатель является контрактом"
+            entries.append(entry)
+
+        # Цепочку nonce и раздел баланса образуют только строки, которые будут отправлены:
+        # пропущенная строка не должна оставлять пропуск в nonce следующих переводов
+        _, duplicates = group_by_sender([entry for entry in entries if entry['action'] == 'send'])
+        chain_positions = {}
+        for address, account_ids in duplicates.items():
+            for position, account_id in enumerate(account_ids):
+                chain_positions[account_id] = (position, len(account_ids))
+            self.logger.warning(f"👥 Отправитель {address} повторяется в строках {', '.join(map(str, account_ids))}: "
+                                f"баланс будет разделен, nonce пойдут цепочкой")
+
+        for entry in entries:
+            if entry['action'] != 'send':
+                continue
+            balance = entry['balance_wei']
+            position, chain_length = chain_positions.get(entry['account_id'], (0, 1))
+            entry['nonce'] += position
+            if max_fee_ratio > 0 and (balance == 0 or fee * chain_length / balance > max_fee_ratio):
+                # Невыгодно при текущем газе - при выполнении плана будет проверено заново
+                entry['action'] = 'defer'
+                entry['reason'] = f"Комиссия превышает {max_fee_ratio:.2%} баланса"
+            else:
+                # Случайный остаток оставляет только последний перевод цепочки отправителя
+                remaining_wei = 0
+                if position == chain_length - 1:
+                    remaining_wei = Web3.to_wei(random.uniform(min_remaining, max_remaining), 'ether')
+                amount = (balance - fee * chain_length) // chain_length - remaining_wei
+                entry['remaining_wei'] = remaining_wei
+                if amount <= 0:
+                    entry['action'] = 'too_small'
+                    entry['reason'] = "Баланс не покрывает комиссию и остаток"
+                else:
+                    entry['amount_wei'] = amount
+
+        plan = {
+            'created_at': datetime.now().isoformat(),
+            'chain_id': self.settings.network.chain_id,
+            'block': block,
+            'gas_price_wei': gas_price,
+            'gas_limit': gas_limit,
+            'summary': self.summarize(entries),
+            'entries': entries
+        }
+        return plan
+
+    @staticmethod
+    def summarize(entries):
+        """Подсчитывает итоги плана"""
+        to_send = [entry for entry in entries if entry['action'] == 'send']
+        return {
+            'accounts': len(entries),
+            'to_send': len(to_send),
+            'skipped': sum(1 for entry in entries if entry['action'] == 'skip'),
+            'too_small': sum(1 for entry in entries if entry['action'] == 'too_small'),
+            'deferred': sum(1 for entry in entries if entry['action'] == 'defer'),
+            'errors': sum(1 for entry in entries if entry['action'] == 'error'),
+            'contract_recipients': sum(1 for entry in entries if entry.get('warning')),
+            'total_amount_wei': sum(entry['amount_wei'] for entry in to_send),
+            'total_fees_wei': sum(entry['fee_wei'] for entry in to_send)
+        }
+
+    def log_summary(self, plan):
+        """Выводит сводку плана в лог"""
+        summary = plan['summary']
+        gas_price_gwei = float(Web3.from_wei(plan['gas_price_wei'], 'gwei'))
+        self.logger.info("=" * 60)
+        self.logger.info(f"📋 ПЛАН ПЕРЕВОДОВ (блок {plan['block']}, газ {gas_price_gwei:.2f} Gwei)")
+        self.logger.info("=" * 60)
+        self.logger.info(f"📤 К отправке: {summary['to_send']}/{summary['accounts']}")
+        self.logger.info(f"💰 Общая сумма к переводу: {float(Web3.from_wei(summary['total_amount_wei'], 'ether')):.8f} ETH")
+        self.logger.info(f"⛽ Общая комиссия: {float(Web3.from_wei(summary['total_fees_wei'], 'ether')):.8f} ETH")
+        if summary['skipped']:
+            self.logger.warning(f"⏭️ Будет пропущено: {summary['skipped']}")
+        if summary['too_small']:
+            self.logger.warning(f"⏭️ Слишком мало для отправки (пропуск): {summary['too_small']}")
+        if summary.get('deferred'):
+            self.logger.warning(f"⏸️ Отложено из-за высокой комиссии: {summary['deferred']}")
+        if summary['errors']:
+            self.logger.error(f"❌ Ошибок чтения состояния: {summary['errors']}")
+        if summary.get('contract_recipients'):
+            self.logger.warning(f"📜 Получатель является контрактом (перевод будет отправлен): {summary['contract_recipients']}")
+        self.logger.info("=" * 60)
+
+
+def save_plan(plan, results_dir="results"):
+    """Сохраняет план в JSON файл и возвращает путь к нему"""
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    plan_file = f"{results_dir}/plan_{timestamp}.json"
+    with open(plan_file, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False)
+    return plan_file
+
+
+def load_plan(plan_file):
+    """Загружает ранее сохраненный план"""
+    if not os.path.exists(plan_file):
+        raise FileNotFoundError(f"Файл плана не найден: {plan_file}")
+
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_latest_plan(results_dir="results"):
+    """Возвращает путь к последнему сохраненному плану или None"""
+    if not os.path.exists(results_dir):
+        return None
+
+    plans = sorted(name for name in os.listdir(results_dir) if name.startswith("plan_") and name.endswith(".json"))
+    return f"{results_dir}/{plans[-1]}" if plans else None
\ No newline at end of file
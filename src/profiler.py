@@ -0,0 +1,194 @@
+import os
+import random
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+# Размер случайной выборки замеров одной фазы для перцентилей в режиме агрегации
+RESERVOIR_SIZE = 10000
+
+
+class PhaseTimer:
+    """Замеряет длительность фаз обработки каждого аккаунта (монотонные часы).
+
+    В режиме aggregate замеры по аккаунтам не хранятся: для каждой фазы копятся
+    количество, сумма, максимум и случайная выборка не больше reservoir_size значений
+    для p50/p95, поэтому память не растет с числом аккаунтов. Каждый замер фазы
+    считается отдельным значением (повторы одного аккаунта не складываются).
+    """
+
+    def __init__(self, aggregate=False, reservoir_size=RESERVOIR_SIZE):
+        self.aggregate = aggregate
+        self.reservoir_size = reservoir_size
+        self.records = defaultdict(lambda: defaultdict(float))
+        # Агрегаты по фазам: {фаза: {'count', 'total', 'max', 'samples'}}
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, account_id, name):
+        """Контекстный менеджер: добавляет время выполнения блока к фазе аккаунта"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(account_id, name, time.perf_counter() - start)
+
+    def add(self, account_id, name, seconds):
+        """Добавляет уже измеренное время к фазе аккаунта"""
+        if self.aggregate:
+            self._observe(name, seconds)
+        else:
+            self.records[account_id][name] += seconds
+
+    def _phase_stats(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': array('d')}
+        return stats
+
+    def _observe(self, name, seconds):
+        stats = self._phase_stats(name)
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        samples = stats['samples']
+        if len(samples) < self.reservoir_size:
+            samples.append(seconds)
+        else:
+            # Алгоритм R: каждый замер попадает в выборку с равной вероятностью
+            slot = random.randrange(stats['count'])
+            if slot < self.reservoir_size:
+                samples[slot] = seconds
+
+    def merge_phases(self, phases):
+        """Добавляет агрегаты фаз другого процесса (выборки объединяются приближенно)"""
+        for name, other in phases.items():
+            stats = self._phase_stats(name)
+            stats['count'] += other['count']
+            stats['total'] += other['total']
+            stats['max'] = max(stats['max'], other['max'])
+            samples = stats['samples'] + other['samples']
+            if len(samples) > self.reservoir_size:
+                samples = array('d', random.sample(samples, self.reservoir_size))
+            stats['samples'] = samples
+
+    def per_account(self):
+        """Возвращает замеры в виде {account_id: {фаза: секунды}} (пусто в режиме aggregate)"""
+        return {account_id: dict(phases) for account_id, phases in self.records.items()}
+
+    def summarize(self):
+        """Считает p50/p95/max и сумму по каждой фазе"""
+        if self.aggregate:
+            summary = {}
+            for name, stats in self.phases.items():
+                values = sorted(stats['samples'])
+                summary[name] = {
+                    'count': stats['count'],
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'max': stats['max'],
+                    'total': stats['total']
+                }
+            return summary
+
+        by_phase = defaultdict(list)
+        for phases in self.records.values():
+            for name, seconds in phases.items():
+                by_phase[name].append(seconds)
+
+        summary = {}
+        for name, values in by_phase.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': values[-1],
+                'total': sum(values)
+            }
+        return summary
+
+    def log_summary(self, logger):
+        """Выводит сводку по фазам в лог, начиная с самой затратной"""
+        summary = self.summarize()
+        if not summary:
+            return
+
+        logger.info("⏱️ Профиль по фазам (секунды): p50 / p95 / max / всего")
+        for name, row in sorted(summary.items(), key=lambda item: item[1]['total'], reverse=True):
+            logger.info(f"   {name:<14} {row['p50']:>8.3f} / {row['p95']:>8.3f} / {row['max']:>8.3f} / {row['total']:>10.1f}  (n={row['count']})")
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class RunProfiler:
+    """Профилировщик участков обработки с сохранением в один pstat файл.
+
+    Профилируются только участки section() (отправка, повторы, наблюдение), поэтому
+    время ожидания ввода в интерактивном меню не попадает в профиль. Если установлен
+    yappi, используется он (учитывает переключения корутин, wall-clock), иначе -
+    стандартный cProfile. Файл открывается snakeviz, flameprof, gprof2dot и т.п.
+    """
+
+    def __init__(self, results_dir="results"):
+        self.results_dir = results_dir
+        self.sections = 0
+        try:
+            import yappi
+        except ImportError:
+            yappi = None
+        self.yappi = yappi
+        if yappi is not None:
+            yappi.set_clock_type("wall")
+            self.profiler = None
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    @contextmanager
+    def section(self):
+        """Профилирует блок; замеры всех блоков накапливаются"""
+        if self.yappi is not None:
+            self.yappi.start()
+        else:
+            self.profiler.enable()
+        self.sections += 1
+        try:
+            yield
+        finally:
+            if self.yappi is not None:
+                self.yappi.stop()
+            else:
+                self.profiler.disable()
+
+    def save(self):
+        """Сохраняет накопленный профиль и возвращает путь к файлу (None, если нечего сохранять)"""
+        if not self.sections:
+            return None
+        if not os.path.exists(self.results_dir):
+            os.makedirs(self.results_dir)
+
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        profile_file = f"{self.results_dir}/profile_{timestamp}.pstat"
+        if self.yappi is not None:
+            self.yappi.get_func_stats().save(profile_file, type="pstat")
+            self.yappi.clear_stats()
+            print(f"⏱️ Профиль (yappi) сохранен в {profile_file}")
+        else:
+            self.profiler.dump_stats(profile_file)
+            print(f"⏱️ Профиль (cProfile) сохранен в {profile_file}")
+        return profile_file
+
+
+def profile_section(profiler):
+    """Участок под профилировщиком, если профилирование включено (--profile)"""
+    return profiler.section() if profiler is not None else nullcontext()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from .journal import iter_journal
+from .rpc import BatchRPC, RPCError
+from .settings import ensure_settings
+
+
+class Reconciler:
+    """Сверяет журнал результатов прошлого запуска с сетью пакетными запросами.
+
+    Журнал читается потоково пачками по chunk_size строк; для каждой пачки receipts,
+    транзакции, nonce и текущие балансы запрашиваются пакетными JSON-RPC вызовами.
+    """
+
+    def __init__(self, settings, logger, rpc=None, chunk_size=1000):
+        self.settings = ensure_settings(settings)
+        self.logger = logger
+        self.rpc = rpc or BatchRPC(
+            self.settings.network.rpc_url,
+            batch_size=self.settings.network.batch_size
+        )
+        self.chunk_size = chunk_size
+
+    def reconcile(self, journal_path, results_dir="results"):
+        """Проверяет все транзакции журнала и сохраняет расхождения в reconcile_<время>.jsonl"""
+        started = time.perf_counter()
+        block = self.rpc.get_block_number()
+        self.logger.info(f"🔎 Сверка {journal_path} с сетью (блок {block})...")
+
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        report_file = f"{results_dir}/reconcile_{timestamp}.jsonl"
+
+        counts = Counter()
+        mismatches = 0
+        rows_checked = 0
+        with open(report_file, 'w', encoding='utf-8') as report:
+            for chunk in self._chunks(journal_path):
+                for row, chain_status, detail in self._check_chunk(chunk, block):
+                    rows_checked += 1
+                    counts[chain_status] += 1
+                    if self._is_mismatch(row, chain_status):
+                        mismatches += 1
+                        report.write(json.dumps({
+                            'account_id': row.get('account_id'),
+                            'address': row.get('address'),
+                            'tx_hash': row.get('tx_hash'),
+                            'recorded_status': row.get('status'),
+                            'chain_status': chain_status,
+                            'detail': detail
+                        }, ensure_ascii=False) + "\n")
+
+        summary = {
+            'journal': journal_path,
+            'block': block,
+            'transactions': rows_checked,
+            'by_status': dict(counts),
+            'mismatches': mismatches,
+            'report_file': report_file if mismatches else None,
+            'seconds': time.perf_counter() - started
+        }
+        if not mismatches:
+            os.remove(report_file)
+        self.log_summary(summary)
+        return summary
+
+    def _chunks(self, journal_path):
+        """Отдает строки журнала с хэшем транзакции пачками"""
+        chunk = []
+        for row in iter_journal(journal_path):
+            if not row.get('tx_hash'):
+                continue
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _check_chunk(self, rows, block):
+        """Определяет состояние в сети каждой транзакции пачки"""
+        receipts = self.rpc.get_receipts([row['tx_hash'] for row in rows])
+
+        # Для транзакций без receipt проверяем, видит ли их нода
+        missing = [index for index, receipt in enumerate(receipts) if receipt is None]
+        transactions = dict(zip(missing, self.rpc.get_transactions([rows[index]['tx_hash'] for index in missing])))
+
+        # Для неизвестных ноде транзакций nonce отправителя показывает, заменена ли она
+        unknown = [index for index in missing if transactions[index] is None]
+        nonces = dict(zip(unknown, self.rpc.get_nonces([rows[index]['address'] for index in unknown], block)))
+
+        # Текущие балансы кошельков с успешной отправкой: не пополнились ли они после нее
+        swept = [index for index, row in enumerate(rows) if row.get('status') == 'success' and 'remaining_wei' in row]
+        balances = dict(zip(swept, self.rpc.get_balances([rows[index]['address'] for index in swept], block)))
+
+        for index, row in enumerate(rows):
+            receipt = receipts[index]
+            if isinstance(receipt, RPCError):
+                yield row, 'unknown', str(receipt)
+            elif receipt is not None:
+                if int(receipt.get('status', '0x0'), 16) != 1:
+                    yield row, 'reverted', f"блок {int(receipt['blockNumber'], 16)}"
+                    continue
+                balance = balances.get(index)
+                if balance is not None and balance > row['remaining_wei'] + row.get('fee_wei', 0):
+                    yield row, 'balance_changed', f"текущий баланс {balance} wei, ожидался остаток {row['remaining_wei']} wei"
+                    continue
+                yield row, 'confirmed', f"блок {int(receipt['blockNumber'], 16)}"
+            elif isinstance(transactions[index], RPCError):
+                yield row, 'unknown', str(transactions[index])
+            elif transactions[index] is not None:
+                yield row, 'pending', "транзакция в mempool, еще не включена в блок"
+            elif row.get('nonce') is not None and nonces.get(index) is not None and nonces[index] > row['nonce']:
+                yield row, 'replaced', f"nonce {row['nonce']} использован другой транзакцией (текущий nonce {nonces[index]})"
+            else:
+                yield row, 'dropped', "транзакция не найдена в сети"
+
+    @staticmethod
+    def _is_mismatch(row, chain_status):
+        """Расхождение: успешная отправка не подтверждена в сети или неудачная все же прошла"""
+        if row.get('status') == 'success':
+            return chain_status != 'confirmed'
+        return chain_status in ('confirmed', 'pending')
+
+    def log_summary(self, summary):
+        """Выводит итоги сверки в лог"""
+        names = {
+            'confirmed': "✅ Подтверждено",
+            'balance_changed': "💰 Кошелек пополнен после отправки",
+            'pending': "⏳ Еще в mempool",
+            'reverted': "❌ Отменено (revert)",
+            'replaced': "🔁 Заменено другой транзакцией",
+            'dropped': "🗑️ Пропало из сети",
+            'unknown': "❓ Не удалось проверить"
+        }
+
+        self.logger.info("=" * 60)
+        self.logger.info(f"🔎 ИТОГИ СВЕРКИ (блок {summary['block']}, {summary['seconds']:.1f} секунд)")
+        self.logger.info("=" * 60)
+        self.logger.info(f"Проверено транзакций: {summary['transactions']}")
+        for status, name in names.items():
+            if summary['by_status'].get(status):
+                self.logger.info(f"{name}: {summary['by_status'][status]}")
+        if summary['mismatches']:
+            self.logger.warning(f"⚠️ Расхождений: {summary['mismatches']}, список сохранен в {summary['report_file']}")
+        else:
+            self.logger.info("🎉 Расхождений с журналом нет")
+        self.logger.info("=" * 60)
\ No newline at end of file
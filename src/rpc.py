@@ -0,0 +1,106 @@
+import itertools
+import requests
+
+from .transport import json_dumps, json_loads, make_session
+
+
+class RPCError(Exception):
+    """Ошибка, возвращенная нодой в ответ на JSON-RPC запрос"""
+
+    def __init__(self, method, error):
+        self.method = method
+        self.error = error
+        message = error.get('message', error) if isinstance(error, dict) else error
+        super().__init__(f"{method}: {message}")
+
+
+class BatchRPC:
+    """Клиент для пакетных JSON-RPC запросов (много вызовов в одном HTTP-запросе)"""
+
+    def __init__(self, rpc_url, batch_size=200, timeout=30, pool_size=4):
+        self.rpc_url = rpc_url
+        self.batch_size = max(1, int(batch_size))
+        self.timeout = timeout
+        self.session = make_session(pool_size, rpc_url)
+        self._ids = itertools.count(1)
+
+    def _post(self, payload):
+        """Отправляет JSON-RPC payload и возвращает декодированный ответ"""
+        try:
+            response = self.session.post(self.rpc_url, data=json_dumps(payload), timeout=self.timeout)
+            response.raise_for_status()
+            return json_loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            raise ConnectionError(f"Ошибка запроса к RPC {self.rpc_url}: {str(e)}")
+
+    def call(self, method, params=None):
+        """Выполняет одиночный JSON-RPC вызов"""
+        reply = self._post({'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params or []})
+        if 'error' in reply:
+            raise RPCError(method, reply['error'])
+        return reply.get('result')
+
+    def batch(self, calls):
+        """Выполняет список вызовов (method, params) пачками.
+
+        Возвращает результаты в исходном порядке; для вызовов, завершившихся
+        ошибкой, на соответствующей позиции находится экземпляр RPCError.
+        """
+        results = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            payload = []
+            ids = []
+            for method, params in chunk:
+                request_id = next(self._ids)
+                ids.append(request_id)
+                payload.append({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params})
+
+            reply = self._post(payload)
+            if isinstance(reply, dict):
+                # Некоторые ноды отвечают одной ошибкой на весь batch
+                raise RPCError('batch', reply.get('error', reply))
+
+            by_id = {item.get('id'): item for item in reply}
+            for request_id, (method, _) in zip(ids, chunk):
+                item = by_id.get(request_id)
+                if item is None:
+                    results.append(RPCError(method, "нет ответа в batch"))
+                elif 'error' in item:
+                    results.append(RPCError(method, item['error']))
+                else:
+                    results.append(item.get('result'))
+        return results
+
+    def get_block_number(self):
+        """Возвращает номер последнего блока"""
+        return int(self.call('eth_blockNumber'), 16)
+
+    def get_gas_price(self):
+        """Возвращает текущую цену газа в wei"""
+        return int(self.call('eth_gasPrice'), 16)
+
+    def get_balances(self, addresses, block):
+        """Возвращает балансы адресов на указанном блоке (None при ошибке)"""
+        return self._batch_quantity('eth_getBalance', addresses, block)
+
+    def get_nonces(self, addresses, block):
+        """Возвращает nonce адресов на указанном блоке (None при ошибке)"""
+        return self._batch_quantity('eth_getTransactionCount', addresses, block)
+
+    def get_codes(self, addresses, block):
+        """Возвращает байткод адресов на указанном блоке (None при ошибке)"""
+        results = self.batch([('eth_getCode', [address, hex(block)]) for address in addresses])
+        return [None if isinstance(result, RPCError) else result for result in results]
+
+    def get_receipts(self, tx_hashes):
+        """Возвращает receipts транзакций (None - транзакция еще не в блоке, RPCError - ошибка запроса)"""
+        return self.batch([('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+
+    def get_transactions(self, tx_hashes):
+        """Возвращает транзакции по хэшам (None - нода не знает транзакцию, RPCError - ошибка запроса)"""
+        return self.batch([('eth_getTransactionByHash', [tx_hash]) for tx_hash in tx_hashes])
+
+    def _batch_quantity(self, method, addresses, block):
+        results = self.batch([(method, [address, hex(block)]) for address in addresses])
+        return [None if isinstance(result, RPCError) or result is None else int(result, 16) for result in results]
\ No newline at end of file
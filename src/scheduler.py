@@ -0,0 +1,108 @@
+import asyncio
+
+
+class DeadlineScheduler:
+    """Планировщик по дедлайнам: готовит следующий аккаунт во время ожидания его слота.
+
+    Интервал между отправками остается равным настроенной случайной задержке, но
+    получение баланса, проверка газа, nonce и подпись выполняются заранее, а
+    ожидание подтверждения идет в фоне и не сдвигает следующий слот.
+    """
+
+    def __init__(self, sender):
+        self.sender = sender
+        self.logger = sender.logger
+        self.prepare_ahead = self.sender.settings.execution.prepare_ahead_seconds
+
+    async def _execute(self, prepared, semaphore):
+        """Отправляет подготовленную транзакцию и освобождает слот параллельности после подтверждения"""
+        try:
+            return await self.sender.execute_prepared(prepared)
+        finally:
+            semaphore.release()
+
+    def _track(self, task, account_id, in_flight):
+        """Добавляет задачу к ожидаемым; ошибка завершившейся задачи выводится в лог, а не теряется"""
+        def on_done(done):
+            in_flight.discard(done)
+            if not done.cancelled() and done.exception() is not None:
+                self.logger.error(f"[Аккаунт {account_id}] Ошибка фоновой отправки: {done.exception()!r}")
+
+        in_flight.add(task)
+        task.add_done_callback(on_done)
+
+    async def run(self, accounts):
+        """Обрабатывает аккаунты, отправляя каждую транзакцию точно в момент открытия ее слота"""
+        loop = asyncio.get_running_loop()
+        stats = self.sender.stats
+        total_accounts = len(accounts)
+        skipped_delay = self.sender.get_skipped_delay()
+        show_progress = self.sender.settings.execution.show_progress
+
+        in_flight = set()
+        next_slot = loop.time()
+        earliest_prepare = loop.time()
+
+        for i, item in enumerate(accounts):
+            account_id = item['account_id']
+
+            # Показываем прогресс
+            if show_progress and i > 0:
+                self.logger.log_progress(
+                    i, total_accounts,
+                    len(stats['successful_accounts']), len(stats['failed_accounts']), len(stats['skipped_accounts'])
+                )
+
+            if 'chain' in item:
+                # Цепочка переводов одного отправителя выполняется целиком начиная со своего слота
+                wait_time = next_slot - loop.time()
+                if wait_time > 0:
+                    with self.sender.timings.phase(account_id, 'slot_wait'):
+                        await asyncio.sleep(wait_time)
+                task = asyncio.create_task(self.sender.send_chain(item))
+            else:
+                # Начинаем подготовку за prepare_ahead секунд до открытия слота
+                prepare_at = max(next_slot - self.prepare_ahead, earliest_prepare)
+                if prepare_at > loop.time():
+                    await asyncio.sleep(prepare_at - loop.time())
+
+                # Слот параллельности занят от подготовки до подтверждения, как в send_native_token;
+                # берется текущий семафор, чтобы горячая перезагрузка max_concurrent действовала и здесь
+                semaphore = self.sender.semaphore
+                await semaphore.acquire()
+                task = None
+                try:
+                    prepared = await self.sender.prepare_account(
+                        item['private_key'], item['to'], account_id,
+                        balance=item.get('balance'), nonce=item.get('nonce'), amount=item.get('amount')
+                    )
+
+                    if prepared is False or prepared == "skipped":
+                        # Слот не израсходован - следующий аккаунт готовим после короткой паузы
+                        earliest_prepare = loop.time() + skipped_delay
+                        continue
+
+                    wait_time = next_slot - loop.time()
+                    if wait_time > 0:
+                        self.logger.info(f"[Аккаунт {account_id}] ⏳ Транзакция подготовлена, отправка через {wait_time:.1f} секунд")
+                        with self.sender.timings.phase(account_id, 'slot_wait'):
+                            await asyncio.sleep(wait_time)
+
+                    # Подтверждение ждем в фоне, следующий слот отсчитывается от момента отправки
+                    task = asyncio.create_task(self._execute(prepared, semaphore))
+                finally:
+                    # Слот освобождает задача отправки; без нее - сразу
+                    if task is None:
+                        semaphore.release()
+            self._track(task, account_id, in_flight)
+
+            if i < total_accounts - 1:
+                delay = self.sender.get_random_delay()
+                self.logger.info(f"⏳ Следующий слот отправки через {delay:.1f} секунд")
+                stats['total_delay_time'] += delay
+                next_slot = loop.time() + delay
+                earliest_prepare = loop.time()
+
+        if in_flight:
+            self.logger.info(f"⏳ Ожидаем подтверждения {len(in_flight)} транзакций...")
+            await asyncio.gather(*in_flight)
\ No newline at end of file
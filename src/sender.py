@@ -1,27 +1,59 @@
 import asyncio
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
-import time
+import functools
 from datetime import datetime, timedelta
 import json
 import os
 import random
 from decimal import Decimal
+from web3.exceptions import TimeExhausted
+
+from .scheduler import DeadlineScheduler
+from .value_scheduler import ValuePriorityScheduler
+from .pipeline import AccountRows, TransferPipeline
+from .profiler import PhaseTimer
+from .settings import ConfigReloader, ensure_settings, merge_hot_settings
+from .utils import group_by_sender
+from .cache import get_block_cache
+from .journal import ResultsJournal
+from .keystore import stored_address
+from .gas_tuner import GasTuner
+from .head_gate import HeadGate
+from .transport import make_web3
+from .rpc import BatchRPC
 
 class TokenSender:
     """Оптимизированный класс для отправки ETH со случайными остатками и задержками"""
 
-    def __init__(self, config, logger):
-        self.config = config
+    def __init__(self, settings, logger, config_path="config.yaml"):
+        # Принимаем и готовые Settings, и словарь конфигурации (он проверяется здесь же)
+        self.settings = ensure_settings(settings)
+        self.config_path = config_path
         self.logger = logger
         self.w3 = self._setup_web3()
-        self.semaphore = asyncio.Semaphore(config['execution']['max_concurrent'])
+        self.semaphore = asyncio.Semaphore(self.settings.execution.max_concurrent)
         self.last_gas_notification = None
+        # Начало общего ожидания окна газа в очереди по стоимости (иначе ожидание идет от каждой проверки)
+        self.gas_wait_started = None
+        
+        # Общий кэш чтений (цена газа, баланс, nonce) с ключом по номеру блока
+        self.cache = get_block_cache(self.settings, self.w3)
+        self._check_chain_id()
+        
+        # Замеры времени по фазам обработки каждого аккаунта
+        # (в конвейере - только агрегаты по фазам, чтобы память не росла с числом аккаунтов)
+        self.timings = PhaseTimer(aggregate=self.settings.execution.pipeline.enabled)
+        
+        # Журнал результатов: каждый исход аккаунта сразу дописывается в results/outcomes_*.jsonl
+        self.journal = ResultsJournal()
         
-        # Кэширование для оптимизации
-        self._gas_price_cache = None
-        self._gas_price_cache_time = None
-        self._cache_duration = 30  # Кэшируем цену газа на 30 секунд
+        # Автонастройка множителя цены газа по задержке включения транзакций
+        self.gas_tuner = self._setup_gas_tuner()
+        
+        # Удержание подписанных транзакций до нового блока
+        block_aligned = self.settings.execution.block_aligned
+        self.head_gate = HeadGate(self, block_aligned) if block_aligned.enabled else None
+        # Задержка включения отправленных транзакций (от отправки до receipt)
+        self.inclusion = {'transactions': 0, 'blocks': 0, 'seconds': 0.0}
         
         # Статистика
         self.stats = {
@@ -32,76 +64,117 @@ class TokenSender:
             'total_gas_used': 0,
             'total_delay_time': 0,
             'start_time': None,
-            'end_time': None
+            'end_time': None,
+            'phase_timings': {},
+            'retry_passes': 0
         }
+        
+        # Аккаунты текущего запуска по account_id (для очереди повторов)
+        self._accounts = {}
+        # Повторяющиеся отправители, о которых уже сообщено
+        self._reported_duplicates = set()
+
+    def apply_settings(self, new_settings):
+        """Атомарно подменяет настройки, которые можно менять во время работы (горячая перезагрузка)"""
+        merged = merge_hot_settings(self.settings, new_settings)
+        if merged == self.settings:
+            return
+
+        if merged.execution.max_concurrent != self.settings.execution.max_concurrent:
+            # Уже запущенные отправки освобождают старый семафор, новые ждут новый
+            self.semaphore = asyncio.Semaphore(merged.execution.max_concurrent)
+
+        self.settings = merged
+        self.logger.info(f"⚙️ Настройки обновлены из {self.config_path}: "
+                         f"лимит газа {merged.gas_monitor.max_gas_price_gwei} Gwei, "
+                         f"множитель {merged.transaction.gas_price_multiplier}, "
+                         f"параллельность {merged.execution.max_concurrent}")
+
+    def start_config_reloader(self):
+        """Запускает фоновую проверку config.yaml, если включена горячая перезагрузка"""
+        if not self.settings.hot_reload.enabled:
+            return None
+
+        reloader = ConfigReloader(self.config_path, self.apply_settings, self.logger, self.settings.hot_reload.check_interval)
+        return asyncio.create_task(reloader.run())
 
     def _setup_web3(self):
         """Настраивает подключение к Web3"""
-        w3 = Web3(Web3.HTTPProvider(self.config['network']['rpc_url']))
-        
-        if self.config['network']['chain_id'] != 1:
-            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        w3 = make_web3(self.settings)
         
         if not w3.is_connected():
-            raise ConnectionError(f"Не удалось подключиться к RPC: {self.config['network']['rpc_url']}")
+            raise ConnectionError(f"Не удалось подключиться к RPC: {self.settings.network.rpc_url}")
         
-        self.logger.info(f"Успешное подключение к RPC: {self.config['network']['rpc_url']}")
+        self.logger.info(f"Успешное подключение к RPC: {self.settings.network.rpc_url}")
         return w3
 
-    def shuffle_wallets_data(self, private_keys, recipient_addresses):
-        """Перемешивает кошельки с сохранением соответствия отправитель-получатель"""
-        if not self.config.get('execution', {}).get('shuffle_wallets', False):
-            return private_keys, recipient_addresses
-        
-        # Создаем пары (приватный_ключ, адрес_получателя)
-        wallet_pairs = list(zip(private_keys, recipient_addresses))
-        
-        # Перемешиваем пары
-        random.shuffle(wallet_pairs)
+    def _setup_gas_tuner(self):
+        """Создает регулятор множителя газа, если он включен (работает только с динамической ценой)"""
+        transaction_settings = self.settings.transaction
+        if not transaction_settings.gas_tuner.enabled:
+            return None
+        if not transaction_settings.use_dynamic_gas:
+            self.logger.warning("⚠️ transaction.gas_tuner включен, но use_dynamic_gas выключен: автонастройка не используется")
+            return None
+        return GasTuner(transaction_settings.gas_tuner, self.settings.network.chain_id,
+                        transaction_settings.gas_price_multiplier, self.logger)
+
+    def _check_chain_id(self):
+        """Сверяет chain_id сети с конфигом (значение кэшируется на весь процесс)"""
+        try:
+            network_chain_id = self.cache.chain_id()
+        except Exception as e:
+            self.logger.warning(f"Не удалось получить chain_id сети: {str(e)}")
+            return
+
+        if network_chain_id != self.settings.network.chain_id:
+            self.logger.warning(f"⚠️ chain_id сети ({network_chain_id}) не совпадает с network.chain_id в конфиге "
+                                f"({self.settings.network.chain_id}): транзакции будут отклонены")
+
+    def shuffle_wallets_data(self, accounts):
+        """Перемешивает кошельки с сохранением соответствия отправитель-получатель.
+
+        account_id каждого кошелька остается номером строки в исходных файлах.
+        """
+        if not self.settings.execution.shuffle_wallets:
+            return accounts
         
-        # Разделяем обратно на два списка
-        shuffled_private_keys, shuffled_recipient_addresses = zip(*wallet_pairs)
+        if isinstance(accounts, AccountRows):
+            # Строки создаются по требованию - перемешивается только порядок индексов
+            shuffled_accounts = accounts.shuffled()
+        else:
+            # Перемешиваем копию списка, не трогая исходный порядок
+            shuffled_accounts = list(accounts)
+            random.shuffle(shuffled_accounts)
         
         self.logger.info("🔀 Кошельки перемешаны (с сохранением соответствия отправитель-получатель)")
         
-        return list(shuffled_private_keys), list(shuffled_recipient_addresses)
+        return shuffled_accounts
 
     def get_random_delay(self):
         """Возвращает случайную задержку между транзакциями"""
-        min_delay = self.config['execution']['random_delay_range']['min']
-        max_delay = self.config['execution']['random_delay_range']['max']
+        min_delay, max_delay = self.settings.execution.random_delay_range
         return random.uniform(min_delay, max_delay)
 
     def get_skipped_delay(self):
         """Возвращает задержку для пропущенных аккаунтов"""
-        return self.config['execution'].get('skipped_account_delay', 2)
+        return self.settings.execution.skipped_account_delay
 
     def get_random_remaining_balance_wei(self):
         """Возвращает случайный остаток в wei"""
-        min_remaining = self.config['transaction']['random_remaining_balance_eth']['min']
-        max_remaining = self.config['transaction']['random_remaining_balance_eth']['max']
+        min_remaining, max_remaining = self.settings.transaction.random_remaining_balance_eth
         random_remaining_eth = random.uniform(min_remaining, max_remaining)
         return self.w3.to_wei(random_remaining_eth, 'ether'), random_remaining_eth
 
     def get_current_gas_price(self, force_refresh=False):
-        """Получает текущую цену газа из сети с кэшированием"""
-        current_time = time.time()
-        
-        # Проверяем кэш (если не принудительное обновление)
-        if (not force_refresh and 
-            self._gas_price_cache is not None and 
-            self._gas_price_cache_time is not None and 
-            current_time - self._gas_price_cache_time < self._cache_duration):
-            return self._gas_price_cache
-        
+        """Получает текущую цену газа из сети (кэшируется до появления нового блока).
+
+        force_refresh сразу проверяет номер блока; сама цена запрашивается заново только на новом блоке.
+        """
         try:
-            gas_price = self.w3.eth.gas_price
+            gas_price = self.cache.gas_price(fresh=force_refresh)
             gas_price_gwei = self.w3.from_wei(gas_price, 'gwei')
             
-            # Обновляем кэш
-            self._gas_price_cache = (gas_price, gas_price_gwei)
-            self._gas_price_cache_time = current_time
-            
             return gas_price, gas_price_gwei
         except Exception as e:
             self.logger.error(f"Ошибка при получении цены газа: {str(e)}")
@@ -109,17 +182,20 @@ class TokenSender:
 
     async def wait_for_acceptable_gas_price(self, account_id):
         """Ждет пока цена газа не станет приемлемой (вызывается перед каждой транзакцией)"""
-        if not self.config.get('gas_monitor', {}).get('enabled', False):
-            return True
-
-        max_gas_gwei = self.config['gas_monitor']['max_gas_price_gwei']
-        check_interval = self.config['gas_monitor']['check_interval']
-        max_wait_time = self.config['gas_monitor']['max_wait_time']
-        notification_interval = self.config['gas_monitor']['notification_interval']
-        
-        start_time = datetime.now()
+        start_time = self.gas_wait_started or datetime.now()
         
         while True:
+            # Настройки читаются на каждой итерации, чтобы горячая перезагрузка конфига
+            # применялась и к уже идущему ожиданию
+            gas_monitor = self.settings.gas_monitor
+            if not gas_monitor.enabled:
+                return True
+
+            max_gas_gwei = gas_monitor.max_gas_price_gwei
+            check_interval = gas_monitor.check_interval
+            max_wait_time = gas_monitor.max_wait_time
+            notification_interval = gas_monitor.notification_interval
+
             gas_price_wei, gas_price_gwei = self.get_current_gas_price(force_refresh=True)  # Принудительное обновление
             
             if gas_price_wei is None:
@@ -151,32 +227,36 @@ class TokenSender:
             
             await asyncio.sleep(check_interval)
 
+    def get_gas_multiplier(self):
+        """Текущий множитель цены газа: выученный регулятором или из конфига"""
+        if self.gas_tuner is not None:
+            return self.gas_tuner.multiplier
+        return self.settings.transaction.gas_price_multiplier
+
     def get_gas_price(self, force_refresh=False):
         """Получает рекомендуемую цену газа"""
-        if self.config['transaction'].get('use_dynamic_gas', False):
+        transaction_settings = self.settings.transaction
+        if transaction_settings.use_dynamic_gas:
             try:
-                # При принудительном обновлении получаем свежую цену газа
-                if force_refresh:
-                    gas_price = self.w3.eth.gas_price
-                else:
-                    gas_price_data = self.get_current_gas_price()
-                    if gas_price_data and gas_price_data[0]:
-                        gas_price = gas_price_data[0]
-                    else:
-                        gas_price = self.w3.eth.gas_price
+                # При принудительном обновлении цена берется для самого нового блока
+                gas_price = self.cache.gas_price(fresh=force_refresh)
                 
-                multiplier = self.config['transaction'].get('gas_price_multiplier', 1.2)
+                multiplier = self.get_gas_multiplier()
                 gas_price = int(gas_price * multiplier)
                 return gas_price
             except Exception as e:
                 self.logger.warning(f"Не удалось получить динамическую цену газа: {str(e)}. Используем значение из конфига.")
         
-        return self.w3.to_wei(self.config['transaction']['gas_price_gwei'], 'gwei')
+        return self.w3.to_wei(transaction_settings.gas_price_gwei, 'gwei')
 
-    def calculate_send_amount(self, balance, gas_price, gas_limit):
+    def calculate_send_amount(self, balance, gas_price, gas_limit, keep_remaining=True):
         """Вычисляет сумму для отправки (весь баланс минус комиссия и случайный остаток)"""
         total_gas_cost = gas_price * gas_limit
-        remaining_wei, remaining_eth = self.get_random_remaining_balance_wei()
+        if keep_remaining:
+            remaining_wei, remaining_eth = self.get_random_remaining_balance_wei()
+        else:
+            # Промежуточный перевод цепочки: остаток оставляет только последний перевод
+            remaining_wei, remaining_eth = 0, 0.0
         
         amount_to_send = balance - total_gas_cost - remaining_wei
         
@@ -196,222 +276,556 @@ class TokenSender:
         else:
             return obj
 
-    def will_next_account_be_skipped(self, next_private_key):
+    def will_next_account_be_skipped(self, next_private_key, prefetched_balance=None):
         """Предварительно проверяет, будет ли следующий аккаунт пропущен"""
         if not next_private_key:
             return False
         
         try:
-            account = self.w3.eth.account.from_key(next_private_key)
-            from_address = account.address
-            balance = self.w3.eth.get_balance(from_address)
+            if prefetched_balance is not None:
+                balance = prefetched_balance
+            else:
+                account = self.w3.eth.account.from_key(next_private_key)
+                balance = self.cache.get_balance(account.address)
             balance_eth = float(self.w3.from_wei(balance, 'ether'))
             
             # Проверяем минимальный баланс
-            if self.config.get('balance_check', {}).get('enabled', False):
-                min_balance = self.config['balance_check']['minimum_balance']
-                return balance_eth < min_balance
+            if self.settings.balance_check.enabled:
+                min_balance = self.settings.balance_check.minimum_balance
+                if balance_eth < min_balance:
+                    return True
+
+            # Проверяем долю комиссии
+            max_fee_ratio = self.settings.balance_check.max_fee_ratio
+            if max_fee_ratio > 0:
+                return self.get_fee_share(balance)[1] > max_fee_ratio
             
             return False
         except Exception:
             return False
 
-    async def send_native_token(self, private_key, to_address, account_id):
-        """Отправляет нативные токены (ETH) с одного кошелька на указанный адрес"""
-        async with self.semaphore:
-            account = self.w3.eth.account.from_key(private_key)
-            from_address = account.address
+    def _record_success(self, account_id, from_address, tx_hash, amount_wei, gas_used, target_remaining,
+                        to_address=None, nonce=None, fee_wei=None, remaining_wei=None):
+        """Логирует подтвержденную транзакцию, добавляет ее в статистику и журнал результатов"""
+        explorer_url = self.settings.explorer.base_url
+        amount_eth = float(self.w3.from_wei(amount_wei, 'ether'))
 
-            self.logger.info(f"[Аккаунт {account_id}] Начало отправки ETH с {from_address} на {to_address}")
+        self.logger.log_transaction_success(
+            account_id,
+            tx_hash.hex(),
+            explorer_url,
+            f"{amount_eth:.8f}",
+            "ETH",
+            from_address
+        )
 
-            # Получаем баланс
-            try:
-                balance = self.w3.eth.get_balance(from_address)
-                balance_eth = float(self.w3.from_wei(balance, 'ether'))
-            except Exception as e:
-                error_msg = f"Ошибка при получении баланса: {str(e)}"
-                self.logger.log_account_failed(account_id, error_msg)
-                self.stats['failed_accounts'].append({
+        # Обновляем статистику (конвертируем все в float)
+        entry = {
+            'account_id': account_id,
+            'address': from_address,
+            'amount_sent': amount_eth,
+            'gas_used': gas_used,
+            'tx_hash': tx_hash.hex(),
+            'target_remaining': target_remaining
+        }
+        self.stats['successful_accounts'].append(entry)
+        # Для сверки с сетью в журнал пишутся точные значения в wei
+        self.journal.write('success', entry, to=to_address, nonce=nonce, amount_wei=amount_wei,
+                           fee_wei=fee_wei, remaining_wei=remaining_wei)
+        self.stats['total_sent'] += amount_eth
+        self.stats['total_gas_used'] += gas_used
+
+    def _record_failure(self, account_id, from_address, error_msg, reason=None, retryable=True, tx_hash=None, nonce=None):
+        """Логирует неудачу аккаунта и добавляет ее в статистику и журнал результатов.
+
+        retryable=False отмечает неудачи, которые повтор не исправит (например, нехватка средств).
+        tx_hash передается, если последняя попытка успела отправить транзакцию.
+        """
+        self.logger.log_account_failed(account_id, error_msg)
+        entry = {
+            'account_id': account_id,
+            'address': from_address,
+            'reason': reason or error_msg,
+            'retryable': retryable
+        }
+        self.stats['failed_accounts'].append(entry)
+        self.journal.write('failed', entry, tx_hash=tx_hash.hex() if tx_hash is not None else None, nonce=nonce)
+        return False
+
+    def _record_skip(self, entry):
+        """Добавляет пропущенный аккаунт в статистику и журнал результатов"""
+        self.stats['skipped_accounts'].append(entry)
+        self.journal.write('skipped', entry)
+
+    async def _submission_point(self):
+        """Номер блока, base fee (для регулятора газа) и время в момент отправки - для замера задержки включения"""
+        try:
+            if self.head_gate is not None and self.head_gate.head is not None:
+                # Номер блока уже поддерживается свежим опросом HeadGate
+                block_number = self.head_gate.head
+            else:
+                # Свежий номер блока: устаревший завысил бы задержку
+                block_number = await self._run_blocking(self.cache.head, True)
+            base_fee = await self._run_blocking(self.cache.base_fee) if self.gas_tuner is not None else None
+        except Exception:
+            return None
+        return block_number, base_fee, asyncio.get_running_loop().time()
+
+    def _observe_inclusion(self, built, submitted, receipt):
+        """Учитывает задержку включения подтвержденной транзакции и передает ее регулятору газа"""
+        if submitted is None:
+            return
+        block_number, base_fee, sent_at = submitted
+        self.inclusion['transactions'] += 1
+        self.inclusion['blocks'] += max(receipt['blockNumber'] - block_number, 0)
+        self.inclusion['seconds'] += asyncio.get_running_loop().time() - sent_at
+
+        if self.gas_tuner is not None:
+            self.gas_tuner.observe(built['multiplier'], built['gas_price'], int(receipt.get('gasUsed', built['gas_limit'])),
+                                   base_fee, block_number, receipt['blockNumber'])
+
+    async def _wait_for_receipt(self, account_id, tx_hash, built, submitted):
+        """Ждет receipt; транзакция, не включенная за время ожидания, учитывается регулятором газа как промах"""
+        try:
+            with self.timings.phase(account_id, 'receipt'):
+                return await self._run_blocking(self.w3.eth.wait_for_transaction_receipt, tx_hash, timeout=300)
+        except TimeExhausted:
+            if self.gas_tuner is not None and submitted is not None:
+                block_number = submitted[0]
+                try:
+                    head = await self._run_blocking(self.cache.head, True)
+                except Exception:
+                    head = block_number
+                self.gas_tuner.observe_miss(max(head - block_number, 0))
+            raise
+
+    async def _release_on_new_head(self, private_key, from_address, to_address, account_id, balance, built, keep_remaining=True):
+        """Удерживает подписанную транзакцию до нового блока и перепроверяет газ по его base fee.
+
+        Возвращает транзакцию для отправки (переподписанную, если цена газа устарела) или False.
+        """
+        with self.timings.phase(account_id, 'head_wait'):
+            block_number = await self.head_gate.wait_for_release(account_id)
+        try:
+            base_fee = await self._run_blocking(self.cache.base_fee)
+        except Exception as e:
+            self.logger.warning(f"[Аккаунт {account_id}] Не удалось получить base fee блока {block_number}: {str(e)}")
+            return built
+        if base_fee is None:
+            return built
+
+        gas_monitor = self.settings.gas_monitor
+        base_fee_gwei = float(self.w3.from_wei(base_fee, 'gwei'))
+        if gas_monitor.enabled and base_fee_gwei > gas_monitor.max_gas_price_gwei:
+            self.logger.warning(f"[Аккаунт {account_id}] base fee блока {block_number} ({base_fee_gwei:.2f} Gwei) "
+                                f"выше лимита {gas_monitor.max_gas_price_gwei} Gwei")
+            with self.timings.phase(account_id, 'gas_wait'):
+                gas_ok = await self.wait_for_acceptable_gas_price(account_id)
+            if not gas_ok:
+                return self._record_failure(account_id, from_address, "Отмена транзакции из-за высокой цены газа")
+        elif built['gas_price'] >= base_fee:
+            return built
+
+        # Подписанная цена ниже base fee нового блока - транзакция не попадет в блок, подписываем заново
+        self.logger.info(f"[Аккаунт {account_id}] 🧱 Цена газа устарела для блока {block_number}, пересчитываем транзакцию")
+        return await self._run_blocking(
+            self._build_transaction, private_key, from_address, to_address, balance, account_id, 1, built['nonce'], keep_remaining,
+            built.get('planned_amount')
+        )
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Выполняет синхронный вызов web3 в пуле потоков, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def get_fee_share(self, balance, transfers=1):
+        """Возвращает ожидаемую комиссию в wei и ее долю от баланса (цена газа из кэша текущего блока)"""
+        fee = self.get_gas_price() * self.settings.transaction.gas_limit * transfers
+        return fee, (fee / balance if balance > 0 else float('inf'))
+
+    async def _check_balance_and_gas(self, from_address, account_id, balance=None, transfers=1):
+        """Получает баланс, проверяет минимум и долю комиссии, ждет приемлемую цену газа.
+
+        Возвращает баланс в wei либо "skipped"/False, если аккаунт отправлять не нужно.
+        transfers - сколько переводов оплачивается из баланса (цепочка отправителя).
+        """
+        # Получаем баланс
+        try:
+            if balance is None:
+                with self.timings.phase(account_id, 'balance'):
+                    balance = await self._run_blocking(self.cache.get_balance, from_address)
+            balance_eth = float(self.w3.from_wei(balance, 'ether'))
+        except Exception as e:
+            return self._record_failure(account_id, from_address, f"Ошибка при получении баланса: {str(e)}")
+
+        # Проверяем минимальный баланс
+        balance_check = self.settings.balance_check
+        if balance_check.enabled:
+            min_balance = balance_check.minimum_balance
+            if balance_eth < min_balance:
+                skip_msg = balance_check.skip_message
+                self.logger.log_account_skipped(account_id, skip_msg, f"{balance_eth:.8f} ETH")
+                self._record_skip({
                     'account_id': account_id,
                     'address': from_address,
-                    'reason': error_msg
+                    'balance': balance_eth,
+                    'min_required': min_balance,
+                    'transient': False
                 })
-                return False
+                return "skipped"
+            
+            self.logger.info(f"[Аккаунт {account_id}] Баланс проверен: {balance_eth:.8f} ETH (минимум: {min_balance} ETH) ✓")
 
-            # Проверяем минимальный баланс
-            if self.config.get('balance_check', {}).get('enabled', False):
-                min_balance = self.config['balance_check']['minimum_balance']
-                if balance_eth < min_balance:
-                    skip_msg = self.config['balance_check']['skip_message']
-                    self.logger.log_account_skipped(account_id, skip_msg, f"{balance_eth:.8f} ETH")
-                    self.stats['skipped_accounts'].append({
-                        'account_id': account_id,
-                        'address': from_address,
-                        'balance': balance_eth,
-                        'min_required': min_balance
-                    })
-                    return "skipped"
-                
-                self.logger.info(f"[Аккаунт {account_id}] Баланс проверен: {balance_eth:.8f} ETH (минимум: {min_balance} ETH) ✓")
-
-            # 🔥 ПРОВЕРЯЕМ ЦЕНУ ГАЗА НЕПОСРЕДСТВЕННО ПЕРЕД ОТПРАВКОЙ ТРАНЗАКЦИИ
-            self.logger.info(f"[Аккаунт {account_id}] 🔍 Проверяем цену газа перед отправкой транзакции...")
-            if not await self.wait_for_acceptable_gas_price(account_id):
-                error_msg = "Отмена транзакции из-за высокой цены газа"
-                self.logger.log_account_failed(account_id, error_msg)
-                self.stats['failed_accounts'].append({
+        # Откладываем аккаунт, если комиссия съест слишком большую часть баланса при текущем газе.
+        # Новых запросов нет: баланс получен выше (из пакетного чтения или отдельным запросом
+        # в последовательном режиме), цена газа берется из кэша текущего блока
+        max_fee_ratio = balance_check.max_fee_ratio
+        if max_fee_ratio > 0:
+            try:
+                fee, fee_ratio = await self._run_blocking(self.get_fee_share, balance, transfers)
+            except Exception as e:
+                return self._record_failure(account_id, from_address, f"Ошибка при оценке комиссии: {str(e)}")
+
+            if fee_ratio > max_fee_ratio:
+                fee_eth = float(self.w3.from_wei(fee, 'ether'))
+                reason = f"Пропущен до следующего прохода: комиссия {fee_eth:.8f} ETH составляет {fee_ratio:.2%} баланса (лимит {max_fee_ratio:.2%})"
+                self.logger.log_account_skipped(account_id, reason, f"{balance_eth:.8f} ETH")
+                self._record_skip({
                     'account_id': account_id,
                     'address': from_address,
-                    'reason': error_msg
+                    'balance': balance_eth,
+                    'fee': fee_eth,
+                    'reason': reason,
+                    'transient': True
                 })
-                return False
+                return "skipped"
 
-            # Отправляем транзакцию
-            for attempt in range(1, self.config['execution']['retry_count'] + 1):
-                try:
-                    # 🚀 ПОЛУЧАЕМ СВЕЖУЮ ЦЕНУ ГАЗА ДЛЯ КАЖДОЙ ПОПЫТКИ
-                    if attempt > 1:
-                        self.logger.info(f"[Аккаунт {account_id}] 🔄 Попытка {attempt}: обновляем цену газа...")
-                        # Принудительно обновляем кэш газа для повторных попыток
-                        self._gas_price_cache = None
-                    
-                    gas_price = self.get_gas_price(force_refresh=(attempt > 1))
-                    gas_limit = self.config['transaction']['gas_limit']
+        # 🔥 ПРОВЕРЯЕМ ЦЕНУ ГАЗА НЕПОСРЕДСТВЕННО ПЕРЕД ОТПРАВКОЙ ТРАНЗАКЦИИ
+        self.logger.info(f"[Аккаунт {account_id}] 🔍 Проверяем цену газа перед отправкой транзакции...")
+        with self.timings.phase(account_id, 'gas_wait'):
+            gas_ok = await self.wait_for_acceptable_gas_price(account_id)
+        if not gas_ok:
+            return self._record_failure(account_id, from_address, "Отмена транзакции из-за высокой цены газа")
+
+        return balance
+
+    def _build_transaction(self, private_key, from_address, to_address, balance, account_id, attempt, nonce=None, keep_remaining=True,
+                           planned_amount=None):
+        """Рассчитывает сумму, получает nonce и подписывает транзакцию для указанной попытки.
+
+        planned_amount - сумма из плана: в первой попытке отправляется она, если баланс покрывает ее
+        вместе с комиссией по текущей цене газа, иначе сумма пересчитывается.
+        Возвращает словарь с подписанной транзакцией или False, если отправка невозможна.
+        """
+        # 🚀 ПОЛУЧАЕМ СВЕЖУЮ ЦЕНУ ГАЗА ДЛЯ КАЖДОЙ ПОПЫТКИ
+        if attempt > 1:
+            self.logger.info(f"[Аккаунт {account_id}] 🔄 Попытка {attempt}: обновляем цену газа...")
+        
+        with self.timings.phase(account_id, 'gas_price'):
+            multiplier = self.get_gas_multiplier()
+            gas_price = self.get_gas_price(force_refresh=(attempt > 1))
+        transaction_settings = self.settings.transaction
+        gas_limit = transaction_settings.gas_limit
+
+        if planned_amount is not None and attempt == 1:
+            if balance >= planned_amount + gas_price * gas_limit:
+                amount_wei = planned_amount
+                target_remaining = float(self.w3.from_wei(balance - planned_amount - gas_price * gas_limit, 'ether'))
+            else:
+                planned_eth = float(self.w3.from_wei(planned_amount, 'ether'))
+                self.logger.warning(f"[Аккаунт {account_id}] Сумма из плана {planned_eth:.8f} ETH не покрывается балансом "
+                                    f"с комиссией по текущей цене газа, пересчитываем сумму")
+                planned_amount = None
+        else:
+            planned_amount = None
+
+        if planned_amount is None:
+            # Пересчитываем сумму для отправки с новой ценой газа
+            amount_wei, target_remaining = self.calculate_send_amount(balance, gas_price, gas_limit, keep_remaining)
+        
+        if amount_wei <= 0:
+            error_msg = "Невозможно отправить транзакцию: недостаточно средств для покрытия комиссии и остатка"
+            return self._record_failure(account_id, from_address, error_msg, retryable=False)
+
+        # Логируем информацию о транзакции (только для первой попытки)
+        if attempt == 1:
+            remaining_balance = balance - amount_wei - (gas_price * gas_limit)
+            remaining_eth = float(self.w3.from_wei(remaining_balance, 'ether'))
+            
+            min_range, max_range = transaction_settings.random_remaining_balance_eth
+            
+            amount_eth = float(self.w3.from_wei(amount_wei, 'ether'))
+            
+            if planned_amount is not None:
+                self.logger.info(f"[Аккаунт {account_id}] Отправляем сумму из плана: {amount_eth:.8f} ETH")
+            elif keep_remaining:
+                self.logger.info(f"[Аккаунт {account_id}] Отправляем весь баланс: {amount_eth:.8f} ETH")
+            else:
+                self.logger.info(f"[Аккаунт {account_id}] Отправляем долю баланса (цепочка отправителя): {amount_eth:.8f} ETH")
+            self.logger.info(f"[Аккаунт {account_id}] 🎲 Случайный остаток: {target_remaining:.8f} ETH (диапазон: {min_range}-{max_range} ETH)")
+            self.logger.info(f"[Аккаунт {account_id}] Останется на кошельке: {remaining_eth:.8f} ETH")
+
+        # Проверяем баланс на покрытие суммы и газа
+        total_cost = amount_wei + gas_price * gas_limit
+        if balance < total_cost:
+            total_cost_eth = float(self.w3.from_wei(total_cost, 'ether'))
+            balance_eth = float(self.w3.from_wei(balance, 'ether'))
+            error_msg = f"Недостаточно ETH на балансе для суммы и газа. Требуется: {total_cost_eth:.8f} ETH, Доступно: {balance_eth:.8f} ETH"
+            return self._record_failure(account_id, from_address, error_msg, retryable=False)
+
+        if nonce is None or attempt > 1:
+            with self.timings.phase(account_id, 'nonce'):
+                nonce = self.cache.get_transaction_count(from_address, fresh=(attempt > 1))
+        tx = {
+            'chainId': self.settings.network.chain_id,
+            'nonce': nonce,
+            'to': to_address,
+            'value': amount_wei,
+            'gas': gas_limit,
+            'gasPrice': gas_price,
+        }
+
+        gas_price_gwei = float(self.w3.from_wei(gas_price, 'gwei'))
+        self.logger.info(f"[Аккаунт {account_id}] Используем цену газа: {gas_price_gwei:.2f} Gwei")
+
+        with self.timings.phase(account_id, 'sign'):
+            signed_tx = self.w3.eth.account.sign_transaction(tx, private_key)
+
+        return {
+            'signed_tx': signed_tx,
+            'nonce': nonce,
+            'amount_wei': amount_wei,
+            'gas_price': gas_price,
+            'multiplier': multiplier,
+            'gas_limit': gas_limit,
+            'target_remaining': target_remaining,
+            'planned_amount': planned_amount
+        }
+
+    async def prepare_account(self, private_key, to_address, account_id, balance=None, nonce=None, amount=None):
+        """Заранее готовит первую попытку отправки: баланс, проверка газа, nonce, цена газа и подпись.
+
+        Возвращает подготовленную транзакцию для execute_prepared либо "skipped"/False.
+        """
+        account = self.w3.eth.account.from_key(private_key)
+        from_address = account.address
+
+        self.logger.info(f"[Аккаунт {account_id}] Подготовка отправки ETH с {from_address} на {to_address}")
+
+        balance = await self._check_balance_and_gas(from_address, account_id, balance)
+        if balance is False or balance == "skipped":
+            return balance
+
+        try:
+            built = await self._run_blocking(
+                self._build_transaction, private_key, from_address, to_address, balance, account_id, 1, nonce, True, amount
+            )
+        except Exception as e:
+            # Подпись не удалась - попытка будет повторена при отправке
+            self.logger.warning(f"[Аккаунт {account_id}] Не удалось подготовить транзакцию заранее: {str(e)}")
+            built = None
 
-                    # Пересчитываем сумму для отправки с новой ценой газа
-                    amount_wei, target_remaining = self.calculate_send_amount(balance, gas_price, gas_limit)
+        if built is False:
+            return False
+
+        return {
+            'private_key': private_key,
+            'from_address': from_address,
+            'to_address': to_address,
+            'account_id': account_id,
+            'balance': balance,
+            'built': built
+        }
+
+    async def execute_prepared(self, prepared):
+        """Отправляет заранее подготовленную транзакцию (с повторными попытками при ошибке)"""
+        return await self._send_with_retries(
+            prepared['private_key'], prepared['from_address'], prepared['to_address'],
+            prepared['account_id'], prepared['balance'], built=prepared['built']
+        )
+
+    async def send_native_token(self, private_key, to_address, account_id, balance=None, nonce=None, amount=None):
+        """Отправляет нативные токены (ETH) с одного кошелька на указанный адрес.
+
+        balance и nonce можно передать заранее (например, из плана), тогда они не запрашиваются повторно;
+        amount - сумма из плана, которая проверяется по текущей цене газа.
+        """
+        async with self.semaphore:
+            account = self.w3.eth.account.from_key(private_key)
+            from_address = account.address
+
+            self.logger.info(f"[Аккаунт {account_id}] Начало отправки ETH с {from_address} на {to_address}")
+
+            balance = await self._check_balance_and_gas(from_address, account_id, balance)
+            if balance is False or balance == "skipped":
+                return balance
+
+            return await self._send_with_retries(private_key, from_address, to_address, account_id, balance, nonce=nonce,
+                                                 planned_amount=amount)
+
+    async def _send_with_retries(self, private_key, from_address, to_address, account_id, balance, nonce=None, built=None, keep_remaining=True,
+                                 planned_amount=None):
+        """Подписывает, отправляет транзакцию и ждет подтверждения с повторными попытками"""
+        balance_eth = float(self.w3.from_wei(balance, 'ether'))
+
+        # Отправляем транзакцию
+        retry_count = self.settings.execution.retry_count
+        for attempt in range(1, retry_count + 1):
+            tx_hash = None
+            try:
+                # Для первой попытки может быть передана заранее подписанная транзакция
+                if attempt > 1 or built is None:
+                    built = await self._run_blocking(
+                        self._build_transaction, private_key, from_address, to_address, balance, account_id, attempt, nonce, keep_remaining,
+                        planned_amount
+                    )
+                if built is not False and self.head_gate is not None:
+                    built = await self._release_on_new_head(private_key, from_address, to_address, account_id,
+                                                            balance, built, keep_remaining)
+                if built is False:
+                    return False
+
+                amount_wei = built['amount_wei']
+                gas_limit = built['gas_limit']
+                target_remaining = built['target_remaining']
+
+                submitted = await self._submission_point()
+                with self.timings.phase(account_id, 'broadcast'):
+                    tx_hash = await self._run_blocking(self.w3.eth.send_raw_transaction, built['signed_tx'].rawTransaction)
+                
+                self.logger.info(f"[Аккаунт {account_id}] Транзакция отправлена: {tx_hash.hex()}")
+
+                receipt = await self._wait_for_receipt(account_id, tx_hash, built, submitted)
+                # Транзакция в блоке - состояние прошлых блоков в кэше больше не актуально
+                self.cache.observe_block(receipt['blockNumber'])
+
+                if receipt['status'] == 1:
+                    self._observe_inclusion(built, submitted, receipt)
+                    fee_wei = built['gas_price'] * gas_limit
+                    self._record_success(account_id, from_address, tx_hash, amount_wei,
+                                         int(receipt.get('gasUsed', gas_limit)), target_remaining,
+                                         to_address=to_address, nonce=built['nonce'], fee_wei=fee_wei,
+                                         # Доля цепочки не оставляет случайный остаток - ожидаемого остатка нет
+                                         remaining_wei=balance - amount_wei - fee_wei if keep_remaining else None)
                     
-                    if amount_wei <= 0:
-                        error_msg = "Невозможно отправить транзакцию: недостаточно средств для покрытия комиссии и остатка"
-                        self.logger.log_account_failed(account_id, error_msg)
-                        self.stats['failed_accounts'].append({
-                            'account_id': account_id,
-                            'address': from_address,
-                            'reason': error_msg
-                        })
-                        return False
-
-                    # Логируем информацию о транзакции (только для первой попытки)
-                    if attempt == 1:
-                        remaining_balance = balance - amount_wei - (gas_price * gas_limit)
-                        remaining_eth = float(self.w3.from_wei(remaining_balance, 'ether'))
-                        
-                        min_range = self.config['transaction']['random_remaining_balance_eth']['min']
-                        max_range = self.config['transaction']['random_remaining_balance_eth']['max']
-                        
-                        amount_eth = float(self.w3.from_wei(amount_wei, 'ether'))
-                        
-                        self.logger.info(f"[Аккаунт {account_id}] Отправляем весь баланс: {amount_eth:.8f} ETH")
-                        self.logger.info(f"[Аккаунт {account_id}] 🎲 Случайный остаток: {target_remaining:.8f} ETH (диапазон: {min_range}-{max_range} ETH)")
-                        self.logger.info(f"[Аккаунт {account_id}] Останется на кошельке: {remaining_eth:.8f} ETH")
-
-                    # Проверяем баланс на покрытие суммы и газа
-                    total_cost = amount_wei + gas_price * gas_limit
-                    if balance < total_cost:
-                        total_cost_eth = float(self.w3.from_wei(total_cost, 'ether'))
-                        error_msg = f"Недостаточно ETH на балансе для суммы и газа. Требуется: {total_cost_eth:.8f} ETH, Доступно: {balance_eth:.8f} ETH"
-                        self.logger.log_account_failed(account_id, error_msg)
-                        self.stats['failed_accounts'].append({
-                            'account_id': account_id,
-                            'address': from_address,
-                            'reason': error_msg
-                        })
-                        return False
-
-                    nonce = self.w3.eth.get_transaction_count(from_address)
-                    tx = {
-                        'chainId': self.config['network']['chain_id'],
-                        'nonce': nonce,
-                        'to': to_address,
-                        'value': amount_wei,
-                        'gas': gas_limit,
-                        'gasPrice': gas_price,
-                    }
-
-                    gas_price_gwei = float(self.w3.from_wei(gas_price, 'gwei'))
-                    self.logger.info(f"[Аккаунт {account_id}] Используем цену газа: {gas_price_gwei:.2f} Gwei")
-
-                    signed_tx = self.w3.eth.account.sign_transaction(tx, private_key)
-                    tx_hash = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                    # Показываем финальный баланс
+                    try:
+                        with self.timings.phase(account_id, 'final_balance'):
+                            final_balance = await self._run_blocking(self.cache.get_balance, from_address)
+                        final_balance_eth = float(self.w3.from_wei(final_balance, 'ether'))
+                        self.logger.info(f"[Аккаунт {account_id}] Финальный баланс кошелька: {final_balance_eth:.8f} ETH")
+                    except:
+                        pass
                     
-                    self.logger.info(f"[Аккаунт {account_id}] Транзакция отправлена: {tx_hash.hex()}")
-
-                    receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-
-                    if receipt['status'] == 1:
-                        explorer_url = self.config.get('explorer', {}).get('base_url', 'https://etherscan.io/tx/')
-                        amount_formatted = f"{float(self.w3.from_wei(amount_wei, 'ether')):.8f}"
-                        
-                        self.logger.log_transaction_success(
-                            account_id, 
-                            tx_hash.hex(), 
-                            explorer_url, 
-                            amount_formatted, 
-                            "ETH", 
-                            from_address
-                        )
-                        
-                        # Обновляем статистику (конвертируем все в float)
-                        gas_used = int(receipt.get('gasUsed', gas_limit))
-                        self.stats['successful_accounts'].append({
-                            'account_id': account_id,
-                            'address': from_address,
-                            'amount_sent': float(self.w3.from_wei(amount_wei, 'ether')),
-                            'gas_used': gas_used,
-                            'tx_hash': tx_hash.hex(),
-                            'target_remaining': target_remaining
-                        })
-                        self.stats['total_sent'] += float(self.w3.from_wei(amount_wei, 'ether'))
-                        self.stats['total_gas_used'] += gas_used
-                        
-                        # Показываем финальный баланс
-                        try:
-                            final_balance = self.w3.eth.get_balance(from_address)
-                            final_balance_eth = float(self.w3.from_wei(final_balance, 'ether'))
-                            self.logger.info(f"[Аккаунт {account_id}] Финальный баланс кошелька: {final_balance_eth:.8f} ETH")
-                        except:
-                            pass
-                        
-                        return True
-                    else:
-                        error_msg = f"Транзакция не удалась: {tx_hash.hex()}"
-                        if attempt < self.config['execution']['retry_count']:
-                            self.logger.warning(f"[Аккаунт {account_id}] {error_msg}. Повторная попытка {attempt + 1}/{self.config['execution']['retry_count']}")
+                    return True
+                else:
+                    error_msg = f"Транзакция не удалась: {tx_hash.hex()}"
+                    if attempt < retry_count:
+                        self.logger.warning(f"[Аккаунт {account_id}] {error_msg}. Повторная попытка {attempt + 1}/{retry_count}")
+                        with self.timings.phase(account_id, 'retry_wait'):
                             await asyncio.sleep(5)
-                        else:
-                            self.logger.log_account_failed(account_id, error_msg)
-                            self.stats['failed_accounts'].append({
-                                'account_id': account_id,
-                                'address': from_address,
-                                'reason': error_msg
-                            })
-                            return False
-
-                except Exception as e:
-                    error_msg = f"Ошибка при отправке транзакции (попытка {attempt}): {str(e)}"
-                    
-                    if "insufficient funds" in str(e).lower():
-                        self.logger.log_account_failed(account_id, "Недостаточно средств для транзакции")
-                        self.stats['failed_accounts'].append({
-                            'account_id': account_id,
-                            'address': from_address,
-                            'reason': "Недостаточно средств"
-                        })
-                        return False
-                    
-                    if attempt < self.config['execution']['retry_count']:
-                        self.logger.warning(f"[Аккаунт {account_id}] {error_msg}. Повторная попытка {attempt + 1}/{self.config['execution']['retry_count']}")
-                        await asyncio.sleep(5)
                     else:
-                        self.logger.log_account_failed(account_id, error_msg)
-                        self.stats['failed_accounts'].append({
-                            'account_id': account_id,
-                            'address': from_address,
-                            'reason': str(e)
-                        })
-                        return False
+                        return self._record_failure(account_id, from_address, error_msg, retryable=False,
+                                                    tx_hash=tx_hash, nonce=built['nonce'])
 
-            return False
+            except Exception as e:
+                error_msg = f"Ошибка при отправке транзакции (попытка {attempt}): {str(e)}"
+                
+                if "insufficient funds" in str(e).lower():
+                    return self._record_failure(account_id, from_address, "Недостаточно средств для транзакции", "Недостаточно средств", retryable=False)
+                
+                if attempt < retry_count:
+                    self.logger.warning(f"[Аккаунт {account_id}] {error_msg}. Повторная попытка {attempt + 1}/{retry_count}")
+                    with self.timings.phase(account_id, 'retry_wait'):
+                        await asyncio.sleep(5)
+                else:
+                    return self._record_failure(account_id, from_address, error_msg, str(e), tx_hash=tx_hash,
+                                                nonce=built['nonce'] if tx_hash is not None else None)
+
+        return False
+
+    async def send_chain(self, item):
+        """Отправляет средства повторяющегося отправителя всем его получателям одной цепочкой nonce.
+
+        Баланс читается и nonce получается один раз, доступная сумма делится поровну между
+        строками отправителя; случайный остаток оставляет последний перевод. Переводы идут
+        по очереди, поэтому не конфликтуют за nonce и не отправляют баланс дважды.
+        """
+        links = item['chain']
+        lead_id = links[0]['account_id']
+
+        async with self.semaphore:
+            private_key = item['private_key']
+            from_address = item.get('address') or self.w3.eth.account.from_key(private_key).address
+            gas_limit = self.settings.transaction.gas_limit
+
+            self.logger.info(f"[Аккаунт {lead_id}] Цепочка из {len(links)} переводов с {from_address}")
+
+            balance = await self._check_balance_and_gas(from_address, lead_id, item.get('balance'), transfers=len(links))
+            if balance is False or balance == "skipped":
+                outcome_key = 'skipped_accounts' if balance == "skipped" else 'failed_accounts'
+                self._copy_chain_outcome(lead_id, links[1:], outcome_key)
+                return balance
+
+            try:
+                nonce = item.get('nonce')
+                if nonce is None:
+                    with self.timings.phase(lead_id, 'nonce'):
+                        nonce = await self._run_blocking(self.cache.get_transaction_count, from_address)
+                with self.timings.phase(lead_id, 'gas_price'):
+                    fee = await self._run_blocking(self.get_gas_price) * gas_limit
+            except Exception as e:
+                self._record_failure(lead_id, from_address, f"Ошибка при подготовке цепочки переводов: {str(e)}")
+                self._copy_chain_outcome(lead_id, links[1:], 'failed_accounts')
+                return False
+
+            share = (balance - fee * len(links)) // len(links)
+            for position, link in enumerate(links):
+                account_id = link['account_id']
+                is_last = position == len(links) - 1
+
+                if is_last:
+                    # Последний перевод забирает фактический остаток за вычетом случайного остатка
+                    try:
+                        with self.timings.phase(account_id, 'balance'):
+                            link_balance = await self._run_blocking(self.cache.get_balance, from_address)
+                    except Exception as e:
+                        return self._record_failure(account_id, from_address, f"Ошибка при получении баланса: {str(e)}")
+                else:
+                    link_balance = share + fee
+
+                result = await self._send_with_retries(
+                    private_key, from_address, link['to'], account_id, link_balance,
+                    nonce=nonce + position, keep_remaining=is_last
+                )
+                if result is not True:
+                    self._copy_chain_outcome(account_id, links[position + 1:], 'failed_accounts',
+                                             f"Цепочка отправителя прервана на аккаунте {account_id}")
+                    return result
+
+            return True
+
+    def _copy_chain_outcome(self, source_id, links, outcome_key, reason=None):
+        """Записывает оставшимся строкам цепочки тот же результат, что получила строка source_id"""
+        source = next((entry for entry in reversed(self.stats[outcome_key]) if entry.get('account_id') == source_id), {})
+        for link in links:
+            entry = dict(source, account_id=link['account_id'])
+            if reason:
+                entry['reason'] = reason
+            self.stats[outcome_key].append(entry)
+            self.journal.write('skipped' if outcome_key == 'skipped_accounts' else 'failed', entry)
+            self.logger.warning(f"[Аккаунт {link['account_id']}] Не обработан: {reason or entry.get('reason', 'пропущен вместе с цепочкой отправителя')}")
+
+    def _group_duplicate_senders(self, accounts):
+        """Объединяет строки одного отправителя в цепочку и один раз сообщает о каждом повторе"""
+        grouped, duplicates = group_by_sender(accounts)
+        for address, account_ids in duplicates.items():
+            if address in self._reported_duplicates:
+                continue
+            self._reported_duplicates.add(address)
+            self.logger.warning(f"👥 Отправитель {address} повторяется в строках {', '.join(map(str, account_ids))}: "
+                                f"переводы пойдут одной цепочкой nonce с разделением баланса")
+        return grouped
 
     def save_results_to_files(self):
         """Сохраняет результаты в файлы с правильной JSON сериализацией"""
@@ -443,59 +857,271 @@ class TokenSender:
             except Exception as e:
                 self.logger.error(f"Ошибка при сохранении пропущенных аккаунтов: {e}")
 
+        # Сохраняем замеры времени по фазам
+        if self.stats['phase_timings'] or self.timings.phases:
+            timings_file = f"{results_dir}/phase_timings_{timestamp}.json"
+            try:
+                timings_data = {'summary': self.timings.summarize()}
+                if self.stats['phase_timings']:
+                    timings_data['accounts'] = self.stats['phase_timings']
+                with open(timings_file, 'w', encoding='utf-8') as f:
+                    json.dump(timings_data, f, indent=2, ensure_ascii=False)
+                self.logger.info(f"Замеры времени по фазам сохранены в {timings_file}")
+            except Exception as e:
+                self.logger.error(f"Ошибка при сохранении замеров времени: {e}")
+
+        # Сохраняем решения регулятора множителя газа
+        if self.stats.get('gas_tuner', {}).get('observations'):
+            tuner_file = f"{results_dir}/gas_tuner_{timestamp}.json"
+            try:
+                with open(tuner_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.stats['gas_tuner'], f, indent=2, ensure_ascii=False)
+                self.logger.info(f"Решения регулятора множителя газа сохранены в {tuner_file}")
+            except Exception as e:
+                self.logger.error(f"Ошибка при сохранении решений регулятора газа: {e}")
+
     async def process_transfers(self, private_keys, recipient_addresses):
         """Обрабатывает все переводы асинхронно с правильной логикой задержек"""
         self.stats['start_time'] = datetime.now()
         
-        total_accounts = len(private_keys)
-        
         if len(private_keys) != len(recipient_addresses):
             self.logger.error(f"Количество приватных ключей ({len(private_keys)}) не соответствует "
                              f"количеству адресов получателей ({len(recipient_addresses)})")
             return
 
+        # account_id - номер строки в файлах, по нему аккаунт всегда сопоставляется с ключом;
+        # из бинарного хранилища адрес берется готовым
+        accounts = AccountRows(private_keys, recipient_addresses)
+        if not self.settings.execution.pipeline.enabled:
+            accounts = list(accounts)
+
         # Перемешиваем кошельки если включено
-        private_keys, recipient_addresses = self.shuffle_wallets_data(private_keys, recipient_addresses)
+        accounts = self.shuffle_wallets_data(accounts)
+
+        await self._run_accounts(accounts)
+
+    async def process_accounts(self, accounts, final_stats=True):
+        """Обрабатывает готовый список аккаунтов с account_id (используется шардами многопроцессного запуска)"""
+        self.stats['start_time'] = datetime.now()
+        await self._run_accounts(accounts, final_stats=final_stats)
+
+    async def process_plan(self, plan, private_keys):
+        """Выполняет сохраненный план: пропуски фиксируются без RPC, остальные отправляются с суммой из плана.
+
+        Перед отправкой баланс и nonce перечитываются пакетом; если они изменились после построения
+        плана, сумма рассчитывается заново по текущему состоянию.
+        """
+        self.stats['start_time'] = datetime.now()
+
+        if plan.get('chain_id') != self.settings.network.chain_id:
+            self.logger.error(f"План построен для chain_id {plan.get('chain_id')}, а в конфиге указан {self.settings.network.chain_id}")
+            return
+
+        accounts = []
+        for entry in plan['entries']:
+            if entry['action'] in ('skip', 'too_small'):
+                self.logger.log_account_skipped(entry['account_id'], f"{entry['reason']} (по плану)")
+                self._record_skip({
+                    'account_id': entry['account_id'],
+                    'address': entry['address'],
+                    'balance': float(self.w3.from_wei(entry['balance_wei'], 'ether')),
+                    'reason': entry['reason'],
+                    'transient': False
+                })
+                continue
+
+            key_index = entry['key_index']
+            if key_index >= len(private_keys):
+                self.logger.error(f"[Аккаунт {entry['account_id']}] Ключ #{key_index + 1} отсутствует в файле ключей")
+                continue
+            private_key = private_keys[key_index]
+            address = stored_address(private_keys, key_index) or self.w3.eth.account.from_key(private_key).address
+            if address != entry['address']:
+                self.logger.error(f"[Аккаунт {entry['account_id']}] Ключ #{key_index + 1} не соответствует адресу из плана {entry['address']}")
+                continue
+
+            account = {'account_id': entry['account_id'], 'private_key': private_key, 'to': entry['to'], 'address': entry['address']}
+            # Для аккаунтов с ошибкой чтения состояние запрашивается заново во время отправки;
+            # отложенные из-за комиссии проверяются заново по текущему газу
+            if entry['action'] in ('send', 'defer'):
+                account['balance'] = entry['balance_wei']
+                account['nonce'] = entry['nonce']
+            if entry['action'] == 'send':
+                account['amount'] = entry['amount_wei']
+            accounts.append(account)
+
+        # Суммы цепочки повторяющегося отправителя делятся при отправке по текущей цене газа
+        senders = {}
+        for account in accounts:
+            senders[account['address']] = senders.get(account['address'], 0) + 1
+        for account in accounts:
+            if senders[account['address']] > 1:
+                account.pop('amount', None)
+
+        await self._revalidate_plan(plan, [account for account in accounts if 'balance' in account])
+
+        self.logger.info(f"📋 Выполняем план от {plan.get('created_at')} (блок {plan.get('block')}): "
+                         f"{len(accounts)} аккаунтов к отправке, {len(self.stats['skipped_accounts'])} пропущено по плану")
+
+        # Порядок отправки, как и без плана, не должен совпадать с порядком строк в файлах
+        accounts = self.shuffle_wallets_data(accounts)
+
+        await self._run_accounts(accounts)
+
+    async def _revalidate_plan(self, plan, accounts):
+        """Перечитывает баланс и nonce аккаунтов плана на текущем блоке и сбрасывает устаревшие суммы"""
+        if not accounts:
+            return
+        rpc = BatchRPC(self.settings.network.rpc_url, batch_size=self.settings.network.batch_size)
+        addresses = list(dict.fromkeys(account['address'] for account in accounts))
+        try:
+            block = await self._run_blocking(rpc.get_block_number)
+            balances = dict(zip(addresses, await self._run_blocking(rpc.get_balances, addresses, block)))
+            nonces = dict(zip(addresses, await self._run_blocking(rpc.get_nonces, addresses, block)))
+        except Exception as e:
+            self.logger.warning(f"Не удалось перечитать состояние аккаунтов плана: {str(e)}. "
+                                f"Баланс и nonce будут запрошены при отправке, суммы рассчитаны заново")
+            balances = nonces = {}
+            block = None
+
+        if block is not None:
+            self.logger.info(f"📋 План построен на блоке {plan.get('block')}, текущий блок {block}")
+
+        # nonce цепочки отправителя берется из первой строки
+        planned_nonces = {}
+        changed = 0
+        for account in accounts:
+            address = account['address']
+            planned_nonces.setdefault(address, account['nonce'])
+            balance, nonce = balances.get(address), nonces.get(address)
+            if balance == account['balance'] and nonce == planned_nonces[address]:
+                continue
+
+            changed += 1
+            if balance is not None and nonce is not None:
+                self.logger.warning(f"[Аккаунт {account['account_id']}] Состояние изменилось после плана: баланс "
+                                    f"{float(self.w3.from_wei(account['balance'], 'ether')):.8f} → {float(self.w3.from_wei(balance, 'ether')):.8f} ETH, "
+                                    f"nonce {planned_nonces[address]} → {nonce}; сумма будет рассчитана заново")
+                account['balance'] = balance
+                account['nonce'] = nonce
+            else:
+                account.pop('balance')
+                account.pop('nonce')
+            account.pop('amount', None)
+
+        if changed:
+            self.logger.warning(f"📋 Состояние изменилось после плана у {changed} аккаунтов: суммы рассчитываются по текущему состоянию")
+
+    async def _run_accounts(self, accounts, final_stats=True):
+        """Последовательно обрабатывает подготовленный список аккаунтов с задержками между ними"""
+        total_accounts = len(accounts)
 
         # Показываем настройки
-        min_remaining = self.config['transaction']['random_remaining_balance_eth']['min']
-        max_remaining = self.config['transaction']['random_remaining_balance_eth']['max']
-        min_delay = self.config['execution']['random_delay_range']['min']
-        max_delay = self.config['execution']['random_delay_range']['max']
+        min_remaining = self.settings.transaction.random_remaining_balance_eth.min
+        max_remaining = self.settings.transaction.random_remaining_balance_eth.max
+        min_delay = self.settings.execution.random_delay_range.min
+        max_delay = self.settings.execution.random_delay_range.max
         skipped_delay = self.get_skipped_delay()
         
         self.logger.info(f"🎲 Режим случайного остатка: {min_remaining} - {max_remaining} ETH")
         self.logger.info(f"⏰ Режим случайной задержки: {min_delay} - {max_delay} секунд")
         self.logger.info(f"⏭️ Задержка после пропущенного аккаунта: {skipped_delay} секунд")
         
-        if self.config.get('execution', {}).get('shuffle_wallets', False):
+        if self.settings.execution.shuffle_wallets:
             self.logger.info(f"🔀 Перемешивание кошельков: включено")
         
         self.logger.info(f"🚀 Начинаем обработку {total_accounts} аккаунтов...")
         self.logger.info(f"⛽ Проверка газа будет выполняться перед каждой транзакцией")
 
+        if self.settings.execution.value_priority:
+            self.logger.info(f"💎 Очередь по стоимости: в окна дешевого газа первыми идут аккаунты с наибольшей суммой")
+        elif self.settings.execution.overlap_preparation:
+            self.logger.info(f"⏱️ Планировщик по дедлайнам: подготовка за {self.settings.execution.prepare_ahead_seconds} секунд до слота")
+
+        if isinstance(accounts, AccountRows):
+            # Конвейеру не нужны словари всех строк: очередь повторов получает их по account_id
+            self._accounts = accounts.by_id()
+        else:
+            for item in accounts:
+                self._accounts[item['account_id']] = item
+
+        reloader_task = self.start_config_reloader()
+        try:
+            if self.settings.execution.pipeline.enabled:
+                # Первый проход конвейером, повторы - обычными проходами
+                await TransferPipeline(self).run(accounts)
+            else:
+                await self._run_pass(accounts)
+            await self._process_retry_queue()
+        finally:
+            if reloader_task:
+                reloader_task.cancel()
+            if self.gas_tuner is not None:
+                # Шард не сохраняет состояние: координатор сохраняет его один раз после объединения шардов
+                if final_stats:
+                    self.gas_tuner.save()
+                self.stats['gas_tuner'] = self.gas_tuner.summary()
+            if self.head_gate is not None:
+                self.head_gate.stop()
+                self.stats['block_aligned'] = self.head_gate.summary()
+        
+        self.stats['end_time'] = datetime.now()
+        if final_stats:
+            self.log_final_stats()
+
+    async def sweep_accounts(self, accounts):
+        """Обрабатывает пачку аккаунтов, найденных режимом наблюдения (без итоговой статистики)"""
+        for item in accounts:
+            self._accounts[item['account_id']] = item
+
+        await self._run_pass(accounts)
+
+    async def _run_pass(self, accounts):
+        """Один проход по списку аккаунтов с задержками между ними"""
+        # Строки одного отправителя обрабатываются одной цепочкой, а не параллельно
+        accounts = self._group_duplicate_senders(accounts)
+        total_accounts = len(accounts)
+        skipped_delay = self.get_skipped_delay()
+
+        if self.settings.execution.value_priority:
+            # Крупные аккаунты первыми занимают короткие окна дешевого газа
+            await ValuePriorityScheduler(self).run(accounts)
+            return
+
+        if self.settings.execution.overlap_preparation:
+            # Подготовка следующего аккаунта идет во время ожидания текущего слота
+            await DeadlineScheduler(self).run(accounts)
+            return
+
         # Обрабатываем аккаунты последовательно с правильной логикой задержек
-        for i, (private_key, to_address) in enumerate(zip(private_keys, recipient_addresses)):
-            account_id = i + 1
+        for i, item in enumerate(accounts):
+            account_id = item['account_id']
             
             # Показываем прогресс
-            if self.config.get('execution', {}).get('show_progress', True) and i > 0:
+            if self.settings.execution.show_progress and i > 0:
                 success_count = len(self.stats['successful_accounts'])
                 failed_count = len(self.stats['failed_accounts'])
                 skipped_count = len(self.stats['skipped_accounts'])
                 self.logger.log_progress(i, total_accounts, success_count, failed_count, skipped_count)
             
-            # Отправляем транзакцию
-            result = await self.send_native_token(private_key, to_address, account_id)
+            # Отправляем транзакцию (или цепочку переводов повторяющегося отправителя)
+            if 'chain' in item:
+                result = await self.send_chain(item)
+            else:
+                result = await self.send_native_token(
+                    item['private_key'], item['to'], account_id,
+                    balance=item.get('balance'), nonce=item.get('nonce'), amount=item.get('amount')
+                )
             
             # Логика задержки ПОСЛЕ обработки аккаунта
-            if i < len(private_keys) - 1:  # Если это не последний аккаунт
+            if i < total_accounts - 1:  # Если это не последний аккаунт
                 current_account_was_skipped = (result == "skipped")
                 
                 if current_account_was_skipped:
                     # Текущий аккаунт пропущен - проверяем следующий
-                    next_private_key = private_keys[i + 1] if i + 1 < len(private_keys) else None
-                    next_will_be_skipped = self.will_next_account_be_skipped(next_private_key)
+                    next_item = accounts[i + 1]
+                    with self.timings.phase(account_id, 'skip_check'):
+                        next_will_be_skipped = self.will_next_account_be_skipped(next_item['private_key'], next_item.get('balance'))
                     
                     if next_will_be_skipped:
                         # Следующий тоже будет пропущен - короткая задержка
@@ -511,16 +1137,66 @@ class TokenSender:
                     self.logger.info(f"⏳ Ожидание {delay:.1f} секунд перед следующей транзакцией...")
                 
                 self.stats['total_delay_time'] += delay
-                await asyncio.sleep(delay)
-        
-        self.stats['end_time'] = datetime.now()
+                with self.timings.phase(account_id, 'delay'):
+                    await asyncio.sleep(delay)
+
+    def _take_retryable(self, accept=None):
+        """Забирает из статистики неудачные и временно пропущенные аккаунты, которые имеет смысл повторить.
+
+        accept(account_id) может оставить часть аккаунтов в статистике (например, исчерпавшие повторы).
+        """
+        retry_ids = []
+        for key, flag, default in (('failed_accounts', 'retryable', True), ('skipped_accounts', 'transient', False)):
+            kept = []
+            for entry in self.stats[key]:
+                if (entry.get(flag, default) and entry.get('account_id') in self._accounts
+                        and (accept is None or accept(entry['account_id']))):
+                    retry_ids.append(entry['account_id'])
+                else:
+                    kept.append(entry)
+            self.stats[key] = kept
+        return list(dict.fromkeys(retry_ids))
+
+    async def _process_retry_queue(self):
+        """Повторяет неудачные аккаунты в том же процессе: то же подключение, кэш газа и соответствие ключей"""
+        retry_config = self.settings.execution.retry_queue
+        if not retry_config.enabled:
+            return
+
+        max_passes = retry_config.max_passes
+        backoff = retry_config.backoff_seconds
 
-        # Финальная статистика
+        for retry_pass in range(1, max_passes + 1):
+            retry_ids = self._take_retryable()
+            if not retry_ids:
+                return
+
+            # Повторяем по реальному ключу аккаунта; заранее прочитанный баланс и nonce уже устарели
+            retry_accounts = [
+                {
+                    'account_id': account_id,
+                    'private_key': self._accounts[account_id]['private_key'],
+                    'to': self._accounts[account_id]['to'],
+                    'address': self._accounts[account_id].get('address')
+                }
+                for account_id in retry_ids
+            ]
+            pass_backoff = backoff * retry_pass
+            self.stats['retry_passes'] = retry_pass
+            self.logger.info(f"🔄 Повторный проход {retry_pass}/{max_passes}: {len(retry_accounts)} аккаунтов через {pass_backoff} секунд...")
+            self.stats['total_delay_time'] += pass_backoff
+            await asyncio.sleep(pass_backoff)
+
+            await self._run_pass(retry_accounts)
+
+    def log_final_stats(self):
+        """Выводит финальную статистику и сохраняет результаты в файлы"""
         success_count = len(self.stats['successful_accounts'])
         failed_count = len(self.stats['failed_accounts'])
         skipped_count = len(self.stats['skipped_accounts'])
         
         execution_time = (self.stats['end_time'] - self.stats['start_time']).total_seconds()
+        self.stats['phase_timings'] = self.timings.per_account()
 
         self.logger.info("=" * 60)
         self.logger.info("📊 ФИНАЛЬНАЯ СТАТИСТИКА")
@@ -529,12 +1205,42 @@ class TokenSender:
         self.logger.error(f"❌ Неудачных транзакций: {failed_count}")
         if skipped_count > 0:
             self.logger.warning(f"⏭️ Пропущенных аккаунтов: {skipped_count}")
+        if self.stats['retry_passes'] > 0:
+            self.logger.info(f"🔄 Выполнено повторных проходов: {self.stats['retry_passes']}")
         
-        if self.config.get('execution', {}).get('detailed_stats', True):
+        if self.settings.execution.detailed_stats:
             self.logger.info(f"💰 Общая сумма отправлено: {self.stats['total_sent']:.8f} ETH")
             self.logger.info(f"⛽ Общий газ использовано: {self.stats['total_gas_used']:,}")
             self.logger.info(f"⏱️ Время выполнения: {execution_time:.1f} секунд")
             self.logger.info(f"⏳ Общее время задержек: {self.stats['total_delay_time']:.1f} секунд")
+            self.logger.info(f"🗄️ Кэш чтений по блокам: попаданий {self.cache.hits}, запросов к RPC {self.cache.misses}")
+            inclusion = self.inclusion
+            if inclusion['transactions']:
+                self.stats['inclusion'] = {
+                    'transactions': inclusion['transactions'],
+                    'mean_blocks': inclusion['blocks'] / inclusion['transactions'],
+                    'mean_seconds': inclusion['seconds'] / inclusion['transactions']
+                }
+                self.logger.info(f"🧱 Время до включения в блок: в среднем {self.stats['inclusion']['mean_blocks']:.2f} блока, "
+                                 f"{self.stats['inclusion']['mean_seconds']:.1f} секунд ({inclusion['transactions']} транзакций)")
+            block_aligned = self.stats.get('block_aligned')
+            if block_aligned and block_aligned['held']:
+                self.logger.info(f"🧱 Удержано до нового блока: {block_aligned['held']} транзакций, "
+                                 f"в среднем {block_aligned['mean_hold_seconds']:.1f} секунд")
+            value_priority = self.stats.get('value_priority')
+            if value_priority and value_priority['windows']:
+                windows = value_priority['windows']
+                released = sum(window['released'] for window in windows)
+                value_eth = sum(window['value_wei'] for window in windows) / 10**18
+                self.logger.info(f"🪟 Окон дешевого газа: {len(windows)}, выпущено аккаунтов: {released} (~{value_eth:.8f} ETH)"
+                                 + (f", без окна по истечении ожидания: {value_priority['forced_releases']}" if value_priority['forced_releases'] else ""))
+            tuner = self.stats.get('gas_tuner')
+            if tuner and tuner['observations']:
+                # Экономия может быть отрицательной (переплата), from_wei такие значения не принимает
+                saved_eth = tuner['fee_saved_wei'] / 10**18
+                self.logger.info(f"🎛️ Множитель газа: {tuner['start_multiplier']:.3f} → {tuner['final_multiplier']:.3f} "
+                                 f"(корректировок: {len(tuner['decisions'])}, средняя задержка {tuner['mean_delay_blocks']:.2f} блока, "
+                                 f"экономия относительно {tuner['static_multiplier']}: {saved_eth:.8f} ETH)")
             
             if success_count > 0:
                 avg_amount = self.stats['total_sent'] / success_count
@@ -548,5 +1254,10 @@ class TokenSender:
                     max_remaining_actual = max(remaining_amounts)
                     self.logger.info(f"🎲 Статистика остатков: мин={min_remaining_actual:.8f}, макс={max_remaining_actual:.8f}, среднее={avg_remaining:.8f} ETH")
 
+            self.timings.log_summary(self.logger)
+
         self.save_results_to_files()
+        self.journal.close()
+        if os.path.exists(self.journal.path):
+            self.logger.info(f"📒 Журнал результатов: {self.journal.path}")
         self.logger.info("=" * 60)
\ No newline at end of file
@@ -0,0 +1,388 @@
+import asyncio
+import os
+from typing import NamedTuple
+
+import yaml
+
+
+class Range(NamedTuple):
+    min: float
+    max: float
+
+
+class NetworkSettings(NamedTuple):
+    rpc_url: str
+    chain_id: int
+    batch_size: int
+    cache_size: int
+    head_check_interval: float
+    lean_transport: bool
+
+
+class GasTunerSettings(NamedTuple):
+    enabled: bool
+    target_blocks: float
+    window: int
+    step: float
+    min_multiplier: float
+    max_multiplier: float
+    state_file: str
+
+
+class TransactionSettings(NamedTuple):
+    gas_limit: int
+    gas_price_gwei: float
+    use_dynamic_gas: bool
+    gas_price_multiplier: float
+    gas_tuner: GasTunerSettings
+    random_remaining_balance_eth: Range
+
+
+class RetryQueueSettings(NamedTuple):
+    enabled: bool
+    max_passes: int
+    backoff_seconds: float
+
+
+class PipelineWorkers(NamedTuple):
+    derive: int
+    prefetch: int
+    plan: int
+    sign: int
+    broadcast: int
+    confirm: int
+
+
+class PipelineSettings(NamedTuple):
+    enabled: bool
+    queue_size: int
+    report_interval: float
+    workers: PipelineWorkers
+
+
+class BlockAlignedSettings(NamedTuple):
+    enabled: bool
+    poll_interval: float
+    release_window: float
+    max_hold: float
+
+
+class ExecutionSettings(NamedTuple):
+    max_concurrent: int
+    shards: int
+    retry_count: int
+    random_delay_range: Range
+    skipped_account_delay: float
+    overlap_preparation: bool
+    prepare_ahead_seconds: float
+    value_priority: bool
+    retry_queue: RetryQueueSettings
+    block_aligned: BlockAlignedSettings
+    pipeline: PipelineSettings
+    shuffle_wallets: bool
+    show_progress: bool
+    detailed_stats: bool
+
+
+class BalanceCheckSettings(NamedTuple):
+    enabled: bool
+    minimum_balance: float
+    skip_message: str
+    max_fee_ratio: float
+
+
+class GasMonitorSettings(NamedTuple):
+    enabled: bool
+    max_gas_price_gwei: float
+    check_interval: float
+    max_wait_time: float
+    notification_interval: float
+
+
+class WatchSettings(NamedTuple):
+    poll_interval: float
+    confirmations: int
+    max_blocks_per_batch: int
+    initial_sweep: bool
+
+
+class HotReloadSettings(NamedTuple):
+    enabled: bool
+    check_interval: float
+
+
+class ExplorerSettings(NamedTuple):
+    base_url: str
+
+
+class Settings(NamedTuple):
+    """Проверенные настройки запуска (неизменяемые, без __dict__).
+
+    Собираются один раз из config.yaml функцией compile_settings; во время работы
+    читаются как атрибуты вместо поиска по вложенным словарям.
+    """
+    network: NetworkSettings
+    transaction: TransactionSettings
+    execution: ExecutionSettings
+    balance_check: BalanceCheckSettings
+    gas_monitor: GasMonitorSettings
+    watch: WatchSettings
+    hot_reload: HotReloadSettings
+    explorer: ExplorerSettings
+
+
+_REQUIRED = object()
+_NUMBER = (int, float)
+
+
+class _Reader:
+    """Читает значения из секций конфига и копит все ошибки, чтобы показать их разом"""
+
+    def __init__(self, config):
+        self.config = config if isinstance(config, dict) else {}
+        self.errors = []
+        if not isinstance(config, dict):
+            self.errors.append("config.yaml должен содержать словарь секций")
+
+    def section(self, data, path):
+        if data is None:
+            return {}
+        if not isinstance(data, dict):
+            self.errors.append(f"{path}: ожидается секция (словарь)")
+            return {}
+        return data
+
+    def value(self, data, path, key, types, default=_REQUIRED, minimum=None):
+        full_key = f"{path}.{key}"
+        if key not in data or data[key] is None:
+            if default is _REQUIRED:
+                self.errors.append(f"{full_key}: обязательный параметр отсутствует")
+            return default if default is not _REQUIRED else None
+
+        value = data[key]
+        # bool - подкласс int, поэтому для числовых параметров его отсекаем явно
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in _as_tuple(types)):
+            self.errors.append(f"{full_key}: неверный тип {type(value).__name__} ({value!r})")
+            return default if default is not _REQUIRED else None
+        if minimum is not None and value < minimum:
+            self.errors.append(f"{full_key}: значение {value} меньше допустимого {minimum}")
+        return value
+
+    def range(self, data, path, key):
+        full_path = f"{path}.{key}"
+        if key not in data:
+            self.errors.append(f"{full_path}: обязательный параметр отсутствует")
+            return Range(0, 0)
+
+        section = self.section(data[key], full_path)
+        low = self.value(section, full_path, 'min', _NUMBER, minimum=0)
+        high = self.value(section, full_path, 'max', _NUMBER, minimum=0)
+        if low is not None and high is not None and low > high:
+            self.errors.append(f"{full_path}: min ({low}) больше max ({high})")
+        return Range(low, high)
+
+
+def _as_tuple(types):
+    return types if isinstance(types, tuple) else (types,)
+
+
+def compile_settings(config):
+    """Проверяет словарь конфигурации и собирает из него Settings.
+
+    Все найденные ошибки собираются в одно исключение ValueError, чтобы
+    неверный конфиг обнаруживался при запуске, а не KeyError посреди работы.
+    """
+    reader = _Reader(config)
+    config = reader.config
+
+    network = reader.section(config.get('network'), 'network')
+    transaction = reader.section(config.get('transaction'), 'transaction')
+    gas_tuner = reader.section(transaction.get('gas_tuner'), 'transaction.gas_tuner')
+    execution = reader.section(config.get('execution'), 'execution')
+    retry_queue = reader.section(execution.get('retry_queue'), 'execution.retry_queue')
+    block_aligned = reader.section(execution.get('block_aligned'), 'execution.block_aligned')
+    pipeline = reader.section(execution.get('pipeline'), 'execution.pipeline')
+    pipeline_workers = reader.section(pipeline.get('workers'), 'execution.pipeline.workers')
+    balance_check = reader.section(config.get('balance_check'), 'balance_check')
+    gas_monitor = reader.section(config.get('gas_monitor'), 'gas_monitor')
+    watch = reader.section(config.get('watch'), 'watch')
+    hot_reload = reader.section(config.get('hot_reload'), 'hot_reload')
+    explorer = reader.section(config.get('explorer'), 'explorer')
+
+    gas_monitor_enabled = reader.value(gas_monitor, 'gas_monitor', 'enabled', bool, False)
+    balance_check_enabled = reader.value(balance_check, 'balance_check', 'enabled', bool, False)
+    # Параметры выключенных секций не обязательны
+    monitor_default = 0 if not gas_monitor_enabled else _REQUIRED
+    balance_default = 0 if not balance_check_enabled else _REQUIRED
+
+    settings = Settings(
+        network=NetworkSettings(
+            rpc_url=reader.value(network, 'network', 'rpc_url', str),
+            chain_id=reader.value(network, 'network', 'chain_id', int, minimum=1),
+            batch_size=reader.value(network, 'network', 'batch_size', int, 200, minimum=1),
+            cache_size=reader.value(network, 'network', 'cache_size', int, 4096, minimum=1),
+            head_check_interval=reader.value(network, 'network', 'head_check_interval', _NUMBER, 1, minimum=0),
+            lean_transport=reader.value(network, 'network', 'lean_transport', bool, True)
+        ),
+        transaction=TransactionSettings(
+            gas_limit=reader.value(transaction, 'transaction', 'gas_limit', int, minimum=21000),
+            gas_price_gwei=reader.value(transaction, 'transaction', 'gas_price_gwei', _NUMBER, minimum=0),
+            use_dynamic_gas=reader.value(transaction, 'transaction', 'use_dynamic_gas', bool, False),
+            gas_price_multiplier=reader.value(transaction, 'transaction', 'gas_price_multiplier', _NUMBER, 1.2, minimum=0),
+            gas_tuner=GasTunerSettings(
+                enabled=reader.value(gas_tuner, 'transaction.gas_tuner', 'enabled', bool, False),
+                target_blocks=reader.value(gas_tuner, 'transaction.gas_tuner', 'target_blocks', _NUMBER, 1, minimum=1),
+                window=reader.value(gas_tuner, 'transaction.gas_tuner', 'window', int, 5, minimum=1),
+                step=reader.value(gas_tuner, 'transaction.gas_tuner', 'step', _NUMBER, 0.05, minimum=0),
+                min_multiplier=reader.value(gas_tuner, 'transaction.gas_tuner', 'min_multiplier', _NUMBER, 1.0, minimum=0),
+                max_multiplier=reader.value(gas_tuner, 'transaction.gas_tuner', 'max_multiplier', _NUMBER, 2.0, minimum=0),
+                state_file=reader.value(gas_tuner, 'transaction.gas_tuner', 'state_file', str, 'data/gas_tuner.json')
+            ),
+            random_remaining_balance_eth=reader.range(transaction, 'transaction', 'random_remaining_balance_eth')
+        ),
+        execution=ExecutionSettings(
+            max_concurrent=reader.value(execution, 'execution', 'max_concurrent', int, minimum=1),
+            shards=reader.value(execution, 'execution', 'shards', int, 1, minimum=1),
+            retry_count=reader.value(execution, 'execution', 'retry_count', int, minimum=1),
+            random_delay_range=reader.range(execution, 'execution', 'random_delay_range'),
+            skipped_account_delay=reader.value(execution, 'execution', 'skipped_account_delay', _NUMBER, 2, minimum=0),
+            overlap_preparation=reader.value(execution, 'execution', 'overlap_preparation', bool, False),
+            prepare_ahead_seconds=reader.value(execution, 'execution', 'prepare_ahead_seconds', _NUMBER, 15, minimum=0),
+            value_priority=reader.value(execution, 'execution', 'value_priority', bool, False),
+            retry_queue=RetryQueueSettings(
+                enabled=reader.value(retry_queue, 'execution.retry_queue', 'enabled', bool, False),
+                max_passes=reader.value(retry_queue, 'execution.retry_queue', 'max_passes', int, 2, minimum=0),
+                backoff_seconds=reader.value(retry_queue, 'execution.retry_queue', 'backoff_seconds', _NUMBER, 60, minimum=0)
+            ),
+            block_aligned=BlockAlignedSettings(
+                enabled=reader.value(block_aligned, 'execution.block_aligned', 'enabled', bool, False),
+                poll_interval=reader.value(block_aligned, 'execution.block_aligned', 'poll_interval', _NUMBER, 0.25, minimum=0.05),
+                release_window=reader.value(block_aligned, 'execution.block_aligned', 'release_window', _NUMBER, 1, minimum=0),
+                max_hold=reader.value(block_aligned, 'execution.block_aligned', 'max_hold', _NUMBER, 30, minimum=0)
+            ),
+            pipeline=PipelineSettings(
+                enabled=reader.value(pipeline, 'execution.pipeline', 'enabled', bool, False),
+                queue_size=reader.value(pipeline, 'execution.pipeline', 'queue_size', int, 1000, minimum=1),
+                report_interval=reader.value(pipeline, 'execution.pipeline', 'report_interval', _NUMBER, 30, minimum=1),
+                workers=PipelineWorkers(
+                    derive=reader.value(pipeline_workers, 'execution.pipeline.workers', 'derive', int, 2, minimum=1),
+                    prefetch=reader.value(pipeline_workers, 'execution.pipeline.workers', 'prefetch', int, 1, minimum=1),
+                    plan=reader.value(pipeline_workers, 'execution.pipeline.workers', 'plan', int, 4, minimum=1),
+                    sign=reader.value(pipeline_workers, 'execution.pipeline.workers', 'sign', int, 2, minimum=1),
+                    broadcast=reader.value(pipeline_workers, 'execution.pipeline.workers', 'broadcast', int, 1, minimum=1),
+                    confirm=reader.value(pipeline_workers, 'execution.pipeline.workers', 'confirm', int, 32, minimum=1)
+                )
+            ),
+            shuffle_wallets=reader.value(execution, 'execution', 'shuffle_wallets', bool, False),
+            show_progress=reader.value(execution, 'execution', 'show_progress', bool, True),
+            detailed_stats=reader.value(execution, 'execution', 'detailed_stats', bool, True)
+        ),
+        balance_check=BalanceCheckSettings(
+            enabled=balance_check_enabled,
+            minimum_balance=reader.value(balance_check, 'balance_check', 'minimum_balance', _NUMBER, balance_default, minimum=0),
+            skip_message=reader.value(balance_check, 'balance_check', 'skip_message', str, "Аккаунт пропущен: недостаточный баланс ETH"),
+            max_fee_ratio=reader.value(balance_check, 'balance_check', 'max_fee_ratio', _NUMBER, 0, minimum=0)
+        ),
+        gas_monitor=GasMonitorSettings(
+            enabled=gas_monitor_enabled,
+            max_gas_price_gwei=reader.value(gas_monitor, 'gas_monitor', 'max_gas_price_gwei', _NUMBER, monitor_default, minimum=0),
+            check_interval=reader.value(gas_monitor, 'gas_monitor', 'check_interval', _NUMBER, monitor_default, minimum=0),
+            max_wait_time=reader.value(gas_monitor, 'gas_monitor', 'max_wait_time', _NUMBER, monitor_default, minimum=0),
+            notification_interval=reader.value(gas_monitor, 'gas_monitor', 'notification_interval', _NUMBER, monitor_default, minimum=0)
+        ),
+        watch=WatchSettings(
+            poll_interval=reader.value(watch, 'watch', 'poll_interval', _NUMBER, 4, minimum=0),
+            confirmations=reader.value(watch, 'watch', 'confirmations', int, 1, minimum=1),
+            max_blocks_per_batch=reader.value(watch, 'watch', 'max_blocks_per_batch', int, 20, minimum=1),
+            initial_sweep=reader.value(watch, 'watch', 'initial_sweep', bool, False)
+        ),
+        hot_reload=HotReloadSettings(
+            enabled=reader.value(hot_reload, 'hot_reload', 'enabled', bool, False),
+            check_interval=reader.value(hot_reload, 'hot_reload', 'check_interval', _NUMBER, 10, minimum=0.1)
+        ),
+        explorer=ExplorerSettings(
+            base_url=reader.value(explorer, 'explorer', 'base_url', str, 'https://etherscan.io/tx/')
+        )
+    )
+
+    tuner = settings.transaction.gas_tuner
+    if (tuner.min_multiplier is not None and tuner.max_multiplier is not None
+            and tuner.min_multiplier > tuner.max_multiplier):
+        reader.errors.append(f"transaction.gas_tuner: min_multiplier ({tuner.min_multiplier}) "
+                             f"больше max_multiplier ({tuner.max_multiplier})")
+
+    if reader.errors:
+        raise ValueError("Ошибки в конфигурации:\n" + "\n".join(f"   - {error}" for error in reader.errors))
+
+    return settings
+
+
+def load_settings(config_path="config.yaml"):
+    """Загружает config.yaml и собирает проверенные настройки"""
+    with open(config_path, 'r', encoding='utf-8') as file:
+        return compile_settings(yaml.safe_load(file))
+
+
+def ensure_settings(config):
+    """Возвращает Settings, собирая их из словаря, если передан словарь конфигурации"""
+    return config if isinstance(config, Settings) else compile_settings(config)
+
+
+def merge_hot_settings(current, new):
+    """Переносит из новых настроек только параметры, которые безопасно менять во время работы.
+
+    Меняются лимиты цены газа, множитель, параллельность, задержки, мониторинг газа и
+    проверка баланса; сеть, gas_limit и прочие параметры запуска остаются прежними.
+    """
+    return current._replace(
+        transaction=current.transaction._replace(
+            gas_price_gwei=new.transaction.gas_price_gwei,
+            gas_price_multiplier=new.transaction.gas_price_multiplier
+        ),
+        execution=current.execution._replace(
+            max_concurrent=new.execution.max_concurrent,
+            random_delay_range=new.execution.random_delay_range,
+            skipped_account_delay=new.execution.skipped_account_delay
+        ),
+        balance_check=new.balance_check,
+        gas_monitor=new.gas_monitor
+    )
+
+
+class ConfigReloader:
+    """Следит за изменением config.yaml и атомарно подменяет настройки во время долгого запуска"""
+
+    def __init__(self, config_path, on_reload, logger, check_interval=10):
+        self.config_path = config_path
+        self.on_reload = on_reload
+        self.logger = logger
+        self.check_interval = check_interval
+        self._mtime = self._get_mtime()
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self):
+        """Перечитывает конфиг, если файл изменился; неверный конфиг игнорируется"""
+        mtime = self._get_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            new_settings = load_settings(self.config_path)
+        except Exception as e:
+            self.logger.error(f"⚙️ Ошибка в измененном {self.config_path}, оставляем прежние настройки: {str(e)}")
+            return False
+
+        self.on_reload(new_settings)
+        return True
+
+    async def run(self):
+        """Периодически проверяет файл конфигурации до отмены задачи"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self.check()
\ No newline at end of file
@@ -0,0 +1,219 @@
+import asyncio
+import multiprocessing
+from datetime import datetime
+from eth_account import Account
+
+from .journal import ResultsJournal
+from .keystore import stored_address
+from .logger import setup_logger
+from .pipeline import log_pipeline_summary, merge_pipeline_summaries
+from .settings import ensure_settings
+
+
+def shard_accounts(accounts, shards):
+    """Делит аккаунты на шарды по адресу отправителя.
+
+    Номер шарда зависит только от адреса, поэтому все строки одного отправителя
+    попадают в один процесс и его nonce не расходуется параллельно.
+    """
+    buckets = [[] for _ in range(shards)]
+    for item in accounts:
+        # Адрес сохраняется в элементе, чтобы шард не вычислял его повторно
+        if not item.get('address'):
+            item['address'] = Account.from_key(item['private_key']).address
+        buckets[int(item['address'], 16) % shards].append(item)
+    return buckets
+
+
+def _shard_result(sender):
+    """Статистика и замеры шарда для передачи координатору"""
+    return {'stats': sender.stats, 'timings': sender.timings.per_account(),
+            'phases': sender.timings.phases, 'inclusion': sender.inclusion}
+
+
+def _run_shard(shard_index, settings, accounts, journal_path, conn):
+    """Точка входа процесса-шарда: свой event loop, свое подключение и свой лог"""
+    # Импорт внутри процесса: web3 загружается уже в дочернем интерпретаторе
+    from .sender import TokenSender
+
+    logger = setup_logger(shard=shard_index)
+    sender = None
+    try:
+        sender = TokenSender(settings, logger)
+        # Все шарды дописывают исходы в общий журнал координатора
+        sender.journal = ResultsJournal(journal_path)
+        accounts = sender.shuffle_wallets_data(accounts)
+        asyncio.run(sender.process_accounts(accounts, final_stats=False))
+        conn.send(_shard_result(sender))
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {str(e)}"}
+        if sender is not None:
+            # Исходы, уже полученные шардом до ошибки, координатор учитывает как есть
+            result.update(_shard_result(sender))
+        conn.send(result)
+    finally:
+        if sender is not None:
+            sender.journal.close()
+        conn.close()
+
+
+class ShardedRunner:
+    """Координатор многопроцессного запуска для очень больших наборов кошельков.
+
+    Пары (ключ, получатель) делятся на шарды по адресу отправителя, каждый шард
+    обрабатывается отдельным процессом со своим event loop и RPC подключением.
+    Процессы возвращают статистику по своим аккаунтам через pipe, координатор
+    объединяет ее в одну статистику и один набор файлов результатов.
+    """
+
+    def __init__(self, settings, logger, sender):
+        self.settings = ensure_settings(settings)
+        self.logger = logger
+        # TokenSender координатора: в нем собирается общая статистика и сохраняются результаты
+        self.sender = sender
+        self.shards = self.settings.execution.shards
+        # Итоги автонастройки газа шардов: (номер шарда, summary)
+        self.tuner_summaries = []
+
+    async def run(self, private_keys, recipient_addresses):
+        """Запускает шарды, ждет их завершения и возвращает объединенную статистику"""
+        if len(private_keys) != len(recipient_addresses):
+            self.logger.error(f"Количество приватных ключей ({len(private_keys)}) не соответствует "
+                              f"количеству адресов получателей ({len(recipient_addresses)})")
+            return self.sender.stats
+
+        self.sender.stats['start_time'] = datetime.now()
+
+        # account_id - номер строки в файлах, сохраняется при делении на шарды
+        accounts = [
+            {'account_id': i + 1, 'private_key': private_key, 'to': to_address,
+             'address': stored_address(private_keys, i)}
+            for i, (private_key, to_address) in enumerate(zip(private_keys, recipient_addresses))
+        ]
+        buckets = [bucket for bucket in shard_accounts(accounts, self.shards) if bucket]
+
+        self.logger.info(f"🧩 Многопроцессный запуск: {len(accounts)} аккаунтов в {len(buckets)} шардах "
+                         f"({', '.join(str(len(bucket)) for bucket in buckets)})")
+
+        # spawn: дочерние процессы не наследуют event loop и потоки родителя
+        context = multiprocessing.get_context("spawn")
+        workers = []
+        for shard_index, bucket in enumerate(buckets, start=1):
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_shard,
+                args=(shard_index, self.settings, bucket, self.sender.journal.path, child_conn),
+                name=f"shard-{shard_index}"
+            )
+            process.start()
+            child_conn.close()
+            workers.append((shard_index, bucket, process, parent_conn))
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(None, self._receive, conn) for _, _, _, conn in workers
+        ))
+
+        for (shard_index, bucket, process, _), result in zip(workers, results):
+            process.join()
+            self._merge(shard_index, bucket, result)
+
+        tuner = self.sender.gas_tuner
+        if tuner is not None:
+            # Шарды учатся на своих транзакциях, общее состояние сохраняет только координатор
+            tuner.merge_shards(self.tuner_summaries)
+            tuner.save()
+            self.sender.stats['gas_tuner'] = tuner.summary()
+
+        if self.sender.stats.get('pipeline'):
+            log_pipeline_summary(self.logger, self.sender.stats['pipeline'])
+
+        self.sender.stats['end_time'] = datetime.now()
+        self.sender.log_final_stats()
+        return self.sender.stats
+
+    @staticmethod
+    def _receive(conn):
+        """Блокирующе читает результат шарда; None, если процесс завершился без ответа"""
+        try:
+            return conn.recv()
+        except EOFError:
+            return None
+        finally:
+            conn.close()
+
+    def _merge(self, shard_index, bucket, result):
+        """Добавляет результаты шарда в общую статистику координатора"""
+        stats = self.sender.stats
+
+        if result is not None and 'stats' in result:
+            self._merge_stats(shard_index, result)
+
+        if result is None or 'error' in result:
+            # Шард упал - его аккаунты без исхода считаем неудачными, их можно повторить;
+            # исходы, полученные до ошибки, уже учтены и записаны в журнал самим шардом
+            error_msg = result['error'] if result else "процесс завершился без результата"
+            self.logger.error(f"🧩 Шард {shard_index} завершился с ошибкой: {error_msg}")
+            finished = set()
+            if result is not None and 'stats' in result:
+                finished = {entry.get('account_id') for key in ('successful_accounts', 'failed_accounts', 'skipped_accounts')
+                            for entry in result['stats'][key]}
+            for item in bucket:
+                if item['account_id'] in finished:
+                    continue
+                entry = {
+                    'account_id': item['account_id'],
+                    'address': item['address'],
+                    'reason': f"Ошибка шарда {shard_index}: {error_msg}",
+                    'retryable': True
+                }
+                stats['failed_accounts'].append(entry)
+                self.sender.journal.write('failed', entry)
+            stats['failed_accounts'].sort(key=lambda entry: entry.get('account_id', 0))
+            return
+
+        shard_stats = result['stats']
+        self.logger.info(f"🧩 Шард {shard_index} завершен: ✅ {len(shard_stats['successful_accounts'])} | "
+                         f"❌ {len(shard_stats['failed_accounts'])} | ⏭️ {len(shard_stats['skipped_accounts'])}")
+
+    def _merge_stats(self, shard_index, result):
+        """Добавляет статистику и замеры шарда (полные или полученные до ошибки) к общим"""
+        stats = self.sender.stats
+        shard_stats = result['stats']
+        for key in ('successful_accounts', 'failed_accounts', 'skipped_accounts'):
+            stats[key].extend(shard_stats[key])
+            stats[key].sort(key=lambda entry: entry.get('account_id', 0))
+        for key in ('total_sent', 'total_gas_used', 'total_delay_time'):
+            stats[key] += shard_stats[key]
+        stats['retry_passes'] = max(stats['retry_passes'], shard_stats['retry_passes'])
+        if shard_stats.get('gas_tuner'):
+            self.tuner_summaries.append((shard_index, shard_stats['gas_tuner']))
+
+        # Отчет о включении строится из сумм, поэтому суммы шардов складываются без потери точности
+        for key, value in result['inclusion'].items():
+            self.sender.inclusion[key] += value
+        if shard_stats.get('block_aligned'):
+            self._merge_block_aligned(shard_stats['block_aligned'])
+        if shard_stats.get('value_priority'):
+            merged = stats.setdefault('value_priority', {'windows': [], 'forced_releases': 0})
+            # Окна шардов открываются независимо, номер шарда сохраняется в окне
+            merged['windows'].extend(dict(window, shard=shard_index) for window in shard_stats['value_priority']['windows'])
+            merged['windows'].sort(key=lambda window: window['opened_at'])
+            merged['forced_releases'] += shard_stats['value_priority']['forced_releases']
+        if shard_stats.get('pipeline'):
+            merge_pipeline_summaries(stats.setdefault('pipeline', {}), shard_stats['pipeline'])
+
+        for account_id, phases in result['timings'].items():
+            for name, seconds in phases.items():
+                self.sender.timings.add(account_id, name, seconds)
+        self.sender.timings.merge_phases(result['phases'])
+
+    def _merge_block_aligned(self, shard_summary):
+        """Складывает удержания до нового блока; среднее время удержания взвешивается по числу удержаний"""
+        merged = self.sender.stats.setdefault('block_aligned', {'held': 0, 'mean_hold_seconds': 0.0, 'timeouts': 0})
+        held = merged['held'] + shard_summary['held']
+        if held:
+            merged['mean_hold_seconds'] = (merged['mean_hold_seconds'] * merged['held'] +
+                                           shard_summary['mean_hold_seconds'] * shard_summary['held']) / held
+        merged['held'] = held
+        merged['timeouts'] += shard_summary['timeouts']
\ No newline at end of file
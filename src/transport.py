@@ -0,0 +1,164 @@
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3.middleware import geth_poa_middleware
+from web3.providers.rpc import HTTPProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Заголовки общие для всех запросов: keep-alive и сжатые ответы
+_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+
+def _default(obj):
+    """Типы web3 в параметрах запросов, которые orjson не сериализует сам"""
+    if isinstance(obj, (bytes, bytearray)):
+        return '0x' + bytes(obj).hex()
+    if hasattr(obj, 'keys'):
+        return dict(obj)
+    raise TypeError(f"Тип {type(obj).__name__} не сериализуется в JSON")
+
+
+def json_dumps(obj):
+    """Кодирует объект в JSON bytes (orjson, если установлен, иначе стандартный json)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            # Например, целые больше 64 бит - их умеет только стандартный json
+            pass
+    return json.dumps(obj, cls=Web3JsonEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data):
+    """Декодирует JSON ответ ноды (orjson, если установлен, иначе стандартный json)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def make_session(pool_size, url=None):
+    """HTTP сессия с пулом keep-alive соединений на pool_size одновременных запросов.
+
+    Настройки окружения для url определяются один раз: иначе requests перечитывает
+    переменные окружения и .netrc при каждом запросе. Учитываются прокси (с NO_PROXY),
+    сертификаты из REQUESTS_CA_BUNDLE / CURL_CA_BUNDLE и логин из .netrc.
+    """
+    session = requests.Session()
+    if url is not None:
+        environment = session.merge_environment_settings(url, {}, None, session.verify, None)
+        session.proxies.update(environment['proxies'])
+        session.verify = environment['verify']
+        session.auth = requests.utils.get_netrc_auth(url)
+        session.trust_env = False
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(_HEADERS)
+    return session
+
+
+def transport_pool_size(settings):
+    """Размер пула соединений: лимит параллельности плюс запас на фоновые запросы"""
+    execution = settings.execution
+    if execution.pipeline.enabled:
+        concurrency = sum(execution.pipeline.workers)
+    else:
+        concurrency = execution.max_concurrent
+    # Фоновые запросы: опрос блоков, мониторинг газа, финальные балансы
+    return concurrency + 4
+
+
+class LeanHTTPProvider(HTTPProvider):
+    """HTTP провайдер web3 с общим пулом соединений и быстрым JSON.
+
+    Стандартный HTTPProvider создает отдельную сессию для каждого потока и кодирует
+    запросы стандартным json; этот провайдер использует одну сессию с пулом по
+    лимиту параллельности, orjson при наличии и заранее собранное начало запроса
+    для каждого метода.
+    """
+
+    def __init__(self, endpoint_uri, pool_size=10, timeout=30):
+        super().__init__(endpoint_uri)
+        self.timeout = timeout
+        self.session = make_session(pool_size, endpoint_uri)
+        self._ids = itertools.count(1)
+        self._envelopes = {}
+
+    def encode_rpc_request(self, method, params):
+        envelope = self._envelopes.get(method)
+        if envelope is None:
+            envelope = b'{"jsonrpc":"2.0","method":' + json_dumps(method) + b',"params":'
+            self._envelopes[method] = envelope
+        return b''.join((envelope, json_dumps(params or []), b',"id":', str(next(self._ids)).encode(), b'}'))
+
+    def decode_rpc_response(self, raw_response):
+        return json_loads(raw_response)
+
+    def make_request(self, method, params):
+        response = self.session.post(self.endpoint_uri, data=self.encode_rpc_request(method, params), timeout=self.timeout)
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
+
+
+def make_web3(settings, lean=None):
+    """Создает Web3 для RPC из настроек (облегченный транспорт, если включен network.lean_transport)"""
+    network = settings.network
+    if lean if lean is not None else network.lean_transport:
+        provider = LeanHTTPProvider(network.rpc_url, pool_size=transport_pool_size(settings))
+    else:
+        provider = HTTPProvider(network.rpc_url)
+    w3 = Web3(provider)
+    if network.chain_id != 1:
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    return w3
+
+
+def benchmark_transport(settings, calls=500, threads=None):
+    """Сравнивает стандартный и облегченный провайдер на одних и тех же запросах.
+
+    Запросы выполняются из threads потоков (по умолчанию - execution.max_concurrent), как при
+    отправке через run_in_executor. Возвращает {имя: {'latency_ms', 'cpu_ms'}} - среднее
+    время и процессорное время на вызов.
+    """
+    threads = threads or settings.execution.max_concurrent
+    probe = make_web3(settings, lean=False)
+    address = probe.eth.account.create().address
+    block_number = probe.eth.block_number
+
+    requests_plan = [
+        lambda w3: w3.eth.block_number,
+        lambda w3: w3.eth.get_balance(address),
+        lambda w3: w3.eth.get_transaction_count(address),
+        lambda w3: w3.eth.get_block(block_number, full_transactions=True)
+    ]
+
+    results = {}
+    for name, lean in (('HTTPProvider', False), ('LeanHTTPProvider', True)):
+        w3 = make_web3(settings, lean=lean)
+        # Прогрев: соединение и кэши web3 не должны попадать в замер
+        for request in requests_plan:
+            request(w3)
+
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda i: requests_plan[i % len(requests_plan)](w3), range(calls)))
+        results[name] = {
+            'latency_ms': (time.perf_counter() - wall_started) * 1000 / calls,
+            'cpu_ms': (time.process_time() - cpu_started) * 1000 / calls
+        }
+    return results
\ No newline at end of file
@@ -1,6 +1,9 @@
 import yaml
 import os
 from web3 import Web3
+from eth_account import Account
+
+from .keystore import KeyStore
 
 def validate_private_key(private_key):
     """Валидирует приватный ключ"""
@@ -31,8 +34,17 @@ def load_config(config_path="config.yaml"):
         config = yaml.safe_load(file)
     return config
 
-def load_private_keys(file_path="data/private_keys.txt"):
-    """Загружает приватные ключи из файла с валидацией"""
+def load_private_keys(file_path="data/private_keys.txt", store_path="data/private_keys.bin"):
+    """Загружает приватные ключи из файла с валидацией.
+
+    Если есть бинарное хранилище не старее текстового файла, оно открывается через mmap без разбора.
+    """
+    if store_path and os.path.exists(store_path):
+        if not os.path.exists(file_path) or os.path.getmtime(store_path) >= os.path.getmtime(file_path):
+            return KeyStore(store_path)
+        print(f"⚠️ {file_path} изменен после создания {store_path}: ключи читаются из текстового файла "
+              f"(обновите хранилище: python main.py --convert-keys)")
+
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Файл с приватными ключами не найден: {file_path}")
     
@@ -85,6 +97,33 @@ def load_recipient_addresses(file_path="data/send_to.txt"):
     
     return valid_addresses
 
+def group_by_sender(accounts):
+    """Группирует аккаунты по адресу отправителя (индекс адрес -> строки файла).
+
+    Адрес вычисляется один раз и сохраняется в элементе ('address'). Возвращает список
+    в порядке первого появления отправителя и словарь повторов {адрес: [account_id, ...]};
+    для повторяющегося отправителя элемент получает ключ 'chain' со всеми его строками.
+    """
+    index = {}
+    for item in accounts:
+        if not item.get('address'):
+            item['address'] = Account.from_key(item['private_key']).address
+        index.setdefault(item['address'].lower(), []).append(item)
+
+    grouped = []
+    duplicates = {}
+    for items in index.values():
+        if len(items) == 1:
+            grouped.append(items[0])
+            continue
+
+        lead = dict(items[0])
+        lead['chain'] = [{'account_id': item['account_id'], 'to': item['to']} for item in items]
+        duplicates[lead['address']] = [item['account_id'] for item in items]
+        grouped.append(lead)
+
+    return grouped, duplicates
+
 def to_checksum_address(address):
     """Преобразует адрес в формат checksum"""
     return Web3.to_checksum_address(address)
\ No newline at end of file
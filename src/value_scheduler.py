@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+from datetime import datetime
+
+from .rpc import BatchRPC
+
+# Нижняя граница паузы опроса: при check_interval 0 (мониторинг газа выключен) цикл не должен крутиться вхолостую
+MIN_POLL_INTERVAL = 0.1
+
+
+class ValuePriorityScheduler:
+    """Очередь аккаунтов по переводимой сумме для коротких окон дешевого газа.
+
+    Балансы всех аккаунтов читаются пакетно, аккаунты упорядочиваются по сумме, которую
+    можно перевести после комиссии. Пока цена газа не выше gas_monitor.max_gas_price_gwei,
+    окно считается открытым: первыми отправляются самые крупные аккаунты, столько, сколько
+    позволяет лимит параллельности, остальные ждут следующего окна. Перед отправкой
+    баланс и nonce выпускаемых аккаунтов перечитываются пакетом на текущем блоке.
+    """
+
+    def __init__(self, sender, rpc=None):
+        self.sender = sender
+        self.logger = sender.logger
+        self.rpc = rpc or BatchRPC(
+            sender.settings.network.rpc_url,
+            batch_size=sender.settings.network.batch_size
+        )
+        # Окна всех проходов (включая повторные) накапливаются в общей статистике запуска
+        self.report = sender.stats.setdefault('value_priority', {'windows': [], 'forced_releases': 0})
+
+    async def _read_state(self, items):
+        """Пакетно читает балансы и nonce аккаунтов на одном блоке"""
+        addresses = [item['address'] for item in items]
+        try:
+            block = await self.sender._run_blocking(self.rpc.get_block_number)
+            balances = await self.sender._run_blocking(self.rpc.get_balances, addresses, block)
+            nonces = await self.sender._run_blocking(self.rpc.get_nonces, addresses, block)
+        except Exception as e:
+            # Состояние прочитается по одному аккаунту во время отправки
+            self.logger.warning(f"Не удалось пакетно прочитать состояние {len(items)} аккаунтов: {str(e)}")
+            balances = nonces = [None] * len(items)
+
+        for item, balance, nonce in zip(items, balances, nonces):
+            if balance != item.get('balance'):
+                # Сумма из плана рассчитана по прежнему балансу
+                item.pop('amount', None)
+            item['balance'] = balance
+            item['nonce'] = nonce
+
+    def _transferable(self, item, fee):
+        """Сумма в wei, которую аккаунт переведет после комиссии (ключ очереди)"""
+        balance = item.get('balance')
+        if balance is None:
+            # Баланс неизвестен - аккаунт обрабатывается после известных
+            return -1
+        return balance - fee * len(item.get('chain', [item]))
+
+    def _gas_window(self):
+        """Возвращает (открыто ли окно, цена газа в Gwei) по текущему блоку"""
+        gas_monitor = self.sender.settings.gas_monitor
+        if not gas_monitor.enabled:
+            return True, None
+        gas_price_wei, gas_price_gwei = self.sender.get_current_gas_price(force_refresh=True)
+        if gas_price_wei is None:
+            # Как и при обычном ожидании: без цены газа продолжаем без проверки
+            return True, None
+        return gas_price_gwei <= gas_monitor.max_gas_price_gwei, float(gas_price_gwei)
+
+    def _send(self, item):
+        """Корутина отправки аккаунта (или цепочки переводов повторяющегося отправителя)"""
+        if 'chain' in item:
+            return self.sender.send_chain(item)
+        return self.sender.send_native_token(
+            item['private_key'], item['to'], item['account_id'],
+            balance=item.get('balance'), nonce=item.get('nonce'), amount=item.get('amount')
+        )
+
+    def _start(self, item, in_flight):
+        def on_done(done):
+            in_flight.discard(done)
+            # Ошибка задачи, завершившейся до финального gather, выводится в лог, а не теряется
+            if not done.cancelled() and done.exception() is not None:
+                self.logger.error(f"[Аккаунт {item['account_id']}] Ошибка фоновой отправки: {done.exception()!r}")
+
+        task = asyncio.create_task(self._send(item))
+        in_flight.add(task)
+        task.add_done_callback(on_done)
+
+    async def run(self, accounts):
+        """Обрабатывает аккаунты окнами дешевого газа, начиная с самых крупных"""
+        unknown = [item for item in accounts if item.get('balance') is None]
+        if unknown:
+            await self._read_state(unknown)
+
+        try:
+            fee = await self.sender._run_blocking(self.sender.get_gas_price) * self.sender.settings.transaction.gas_limit
+        except Exception as e:
+            self.logger.warning(f"Не удалось оценить комиссию для очереди по стоимости: {str(e)}")
+            fee = 0
+
+        queue = []
+        for position, item in enumerate(accounts):
+            # Аккаунты ниже минимального баланса пропускаются сразу, окно газа им не нужно
+            if item.get('balance') is not None and self._below_minimum(item['balance']):
+                await self._send(item)
+                continue
+            heapq.heappush(queue, (-self._transferable(item, fee), position, item))
+
+        if not queue:
+            return
+
+        queued_eth = sum(max(-key, 0) for key, _, _ in queue) / 10**18
+        self.logger.info(f"💎 Очередь по стоимости: {len(queue)} аккаунтов, к переводу около {queued_eth:.8f} ETH")
+
+        try:
+            await self._release_windows(queue, fee)
+        finally:
+            self.sender.gas_wait_started = None
+
+    async def _release_windows(self, queue, fee):
+        """Выпускает аккаунты из очереди в открытые окна газа и ждет их завершения"""
+        loop = asyncio.get_running_loop()
+        stats = self.sender.stats
+        total_accounts = len(queue)
+        in_flight = set()
+        waiting_since = datetime.now()
+        forced = False
+        window = None
+        next_release = loop.time()
+
+        while queue:
+            gas_monitor = self.sender.settings.gas_monitor
+            poll_interval = max(gas_monitor.check_interval, MIN_POLL_INTERVAL)
+            is_open, gas_gwei = await self.sender._run_blocking(self._gas_window)
+
+            if not is_open and not forced and (datetime.now() - waiting_since).total_seconds() >= gas_monitor.max_wait_time:
+                # Окно не открылось за max_wait_time - отправляем оставшихся по текущей цене
+                self.logger.warning(f"⏰ Окно газа не открылось за {gas_monitor.max_wait_time/60:.1f} минут, "
+                                    f"отправляем оставшиеся {len(queue)} аккаунтов по текущей цене {gas_gwei:.2f} Gwei")
+                self.report['forced_releases'] += 1
+                forced = True
+                # Ожидание газа внутри отправки уже исчерпано общим ожиданием очереди
+                self.sender.gas_wait_started = waiting_since
+            is_open = is_open or forced
+
+            if not is_open:
+                if window is not None:
+                    self._close_window(window, len(queue))
+                    window = None
+                    waiting_since = datetime.now()
+                await asyncio.sleep(poll_interval)
+                continue
+
+            if window is None:
+                window = {'opened_at': datetime.now().isoformat(timespec='seconds'), 'gas_gwei': gas_gwei,
+                          'released': 0, 'value_wei': 0}
+                self.report['windows'].append(window)
+                gas_note = f"{gas_gwei:.2f} Gwei" if gas_gwei is not None else "без проверки газа"
+                self.logger.info(f"🪟 Окно газа открыто ({gas_note}), в очереди {len(queue)} аккаунтов")
+
+            free_slots = self.sender.settings.execution.max_concurrent - len(in_flight)
+            if free_slots <= 0 or loop.time() < next_release:
+                # Ждем освобождения слота или слота задержки, не закрывая окно
+                await asyncio.sleep(min(poll_interval, max(next_release - loop.time(), MIN_POLL_INTERVAL)))
+                continue
+
+            batch = [heapq.heappop(queue)[2] for _ in range(min(free_slots, len(queue)))]
+            # Баланс мог измениться за время ожидания окна - перечитываем его на текущем блоке
+            await self._read_state(batch)
+            for item in batch:
+                window['released'] += 1
+                window['value_wei'] += max(self._transferable(item, fee), 0)
+                self._start(item, in_flight)
+
+            if self.sender.settings.execution.show_progress:
+                released = total_accounts - len(queue)
+                self.logger.log_progress(
+                    released, total_accounts,
+                    len(stats['successful_accounts']), len(stats['failed_accounts']), len(stats['skipped_accounts'])
+                )
+
+            if queue:
+                delay = self.sender.get_random_delay()
+                self.logger.info(f"⏳ Следующий выпуск из очереди не раньше чем через {delay:.1f} секунд")
+                stats['total_delay_time'] += delay
+                next_release = loop.time() + delay
+
+        if window is not None:
+            self._close_window(window, 0)
+
+        if in_flight:
+            self.logger.info(f"⏳ Ожидаем подтверждения {len(in_flight)} транзакций...")
+            await asyncio.gather(*in_flight)
+
+    def _below_minimum(self, balance):
+        balance_check = self.sender.settings.balance_check
+        return balance_check.enabled and balance / 10**18 < balance_check.minimum_balance
+
+    def _close_window(self, window, remaining):
+        window['closed_at'] = datetime.now().isoformat(timespec='seconds')
+        self.logger.info(f"🪟 Окно газа закрыто: отправлено {window['released']} аккаунтов "
+                         f"(~{window['value_wei'] / 10**18:.8f} ETH), ждут следующего окна: {remaining}")
\ No newline at end of file
@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime
+
+from .keystore import derive_addresses
+from .rpc import BatchRPC, RPCError
+from .settings import ensure_settings
+
+
+class DepositWatcher:
+    """Режим наблюдения: сканирует новые блоки и отправляет средства только с пополненных кошельков.
+
+    Вместо опроса баланса каждого адреса транзакции каждого нового блока сверяются
+    с индексом управляемых адресов (хэш-таблица), поэтому стоимость наблюдения
+    зависит от нагрузки сети, а не от количества кошельков. Пополнения через
+    внутренние вызовы контрактов в полях транзакций не видны - для них есть
+    начальная проверка (watch.initial_sweep).
+    """
+
+    def __init__(self, settings, logger, sender, private_keys, recipient_addresses, rpc=None):
+        self.settings = ensure_settings(settings)
+        self.logger = logger
+        self.sender = sender
+        self.rpc = rpc or BatchRPC(
+            self.settings.network.rpc_url,
+            batch_size=self.settings.network.batch_size
+        )
+
+        self.poll_interval = self.settings.watch.poll_interval
+        self.confirmations = self.settings.watch.confirmations
+        self.max_blocks_per_batch = self.settings.watch.max_blocks_per_batch
+        self.initial_sweep = self.settings.watch.initial_sweep
+
+        # Индекс: адрес отправителя в нижнем регистре -> строки этого отправителя
+        self.accounts = {}
+        addresses = derive_addresses(private_keys)
+        for i, (private_key, to_address, address) in enumerate(zip(private_keys, recipient_addresses, addresses)):
+            self.accounts.setdefault(address.lower(), []).append({
+                'account_id': i + 1,
+                'private_key': private_key,
+                'to': to_address,
+                'address': address
+            })
+
+        self.pending = set()
+        self.last_block = None
+        # Повторы неудачных отправок: адрес -> (число повторов, время loop, раньше которого не повторять)
+        self.retries = {}
+
+    def scan_blocks(self, first_block, last_block):
+        """Загружает блоки пачкой и добавляет в очередь адреса из индекса, получившие транзакции"""
+        blocks = self.rpc.batch([
+            ('eth_getBlockByNumber', [hex(number), True]) for number in range(first_block, last_block + 1)
+        ])
+
+        found = 0
+        for number, block in zip(range(first_block, last_block + 1), blocks):
+            if isinstance(block, RPCError) or block is None:
+                # Блок недоступен - вернемся к нему на следующей итерации
+                return number - 1, found
+
+            for tx in block.get('transactions', []):
+                to_address = tx.get('to')
+                if to_address and to_address.lower() in self.accounts:
+                    address = to_address.lower()
+                    # Новое пополнение отменяет отложенный повтор - кошелек отправляется сразу
+                    self.retries.pop(address, None)
+                    if address not in self.pending:
+                        self.pending.add(address)
+                        found += 1
+                        account = self.accounts[address][0]
+                        self.logger.info(f"[Аккаунт {account['account_id']}] 📥 Пополнение в блоке {number}: {account['address']}")
+
+        return last_block, found
+
+    async def sweep_pending(self):
+        """Пакетно подтверждает балансы пополненных кошельков и отправляет средства"""
+        now = asyncio.get_running_loop().time()
+        addresses = [address for address in self.pending if self.retries.get(address, (0, 0))[1] <= now]
+        if not addresses:
+            return
+        self.pending.difference_update(addresses)
+
+        try:
+            block = await self.sender._run_blocking(self.rpc.get_block_number)
+            balances = await self.sender._run_blocking(
+                self.rpc.get_balances, [self.accounts[address][0]['address'] for address in addresses], block
+            )
+        except Exception:
+            # Адреса проверятся на следующей итерации
+            self.pending.update(addresses)
+            raise
+
+        accounts = []
+        for address, balance in zip(addresses, balances):
+            if balance is None:
+                # Баланс не прочитан - проверим при следующей итерации
+                self.pending.add(address)
+                continue
+            if balance == 0:
+                continue
+            # Строки повторяющегося отправителя TokenSender объединит в одну цепочку
+            for account in self.accounts[address]:
+                accounts.append({
+                    'account_id': account['account_id'],
+                    'private_key': account['private_key'],
+                    'to': account['to'],
+                    'address': account['address'],
+                    'balance': balance
+                })
+
+        if accounts:
+            self.logger.info(f"🧹 Отправка с {len(accounts)} пополненных кошельков (балансы на блоке {block})")
+            await self.sender.sweep_accounts(accounts)
+
+        requeued = self._requeue_failures()
+        for address in addresses:
+            if address not in requeued:
+                self.retries.pop(address, None)
+
+    def _requeue_failures(self):
+        """Возвращает в очередь кошельки с временными неудачами (до retry_queue.max_passes повторов с паузой)"""
+        retry_config = self.sender.settings.execution.retry_queue
+        if not retry_config.enabled:
+            return set()
+
+        def address_of(account_id):
+            return self.sender._accounts[account_id]['address'].lower()
+
+        retry_ids = self.sender._take_retryable(
+            accept=lambda account_id: self.retries.get(address_of(account_id), (0, 0))[0] < retry_config.max_passes
+        )
+        requeued = {address_of(account_id) for account_id in retry_ids}
+        now = asyncio.get_running_loop().time()
+        for address in requeued:
+            attempts = self.retries.get(address, (0, 0))[0] + 1
+            backoff = retry_config.backoff_seconds * attempts
+            self.retries[address] = (attempts, now + backoff)
+            self.pending.add(address)
+            account = self.accounts[address][0]
+            self.logger.info(f"[Аккаунт {account['account_id']}] 🔄 Повтор отправки {attempts}/{retry_config.max_passes} через {backoff} секунд")
+        return requeued
+
+    async def run(self):
+        """Следит за новыми блоками до остановки пользователем (Ctrl+C)"""
+        self.sender.stats['start_time'] = datetime.now()
+        self.logger.info(f"👁️ Режим наблюдения: {len(self.accounts)} адресов в индексе, "
+                         f"опрос каждые {self.poll_interval} секунд, подтверждений: {self.confirmations}")
+
+        if self.initial_sweep:
+            self.pending.update(self.accounts.keys())
+            await self.sweep_pending()
+
+        reloader_task = self.sender.start_config_reloader()
+        try:
+            while True:
+                try:
+                    # Синхронные запросы BatchRPC идут в пуле потоков, чтобы не останавливать
+                    # остальные задачи event loop (перезагрузку конфига, опрос блоков)
+                    head = await self.sender._run_blocking(self.rpc.get_block_number) - self.confirmations + 1
+                    if self.last_block is None:
+                        self.last_block = head - 1
+
+                    while self.last_block < head:
+                        last = min(head, self.last_block + self.max_blocks_per_batch)
+                        self.last_block, _ = await self.sender._run_blocking(self.scan_blocks, self.last_block + 1, last)
+                        if self.last_block < last:
+                            break
+
+                    await self.sweep_pending()
+                except (ConnectionError, RPCError) as e:
+                    self.logger.warning(f"Ошибка при сканировании блоков: {str(e)}. Повтор через {self.poll_interval} секунд")
+
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if reloader_task:
+                reloader_task.cancel()
+            self.sender.stats['end_time'] = datetime.now()
+            self.sender.log_final_stats()
\ No newline at end of file
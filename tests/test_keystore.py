@@ -0,0 +1,87 @@
+import os
+import stat
+
+import pytest
+from eth_account import Account
+
+from src.keystore import HEADER, MAGIC, KeyStore, convert_keys_to_store, derive_addresses, stored_address
+from src.utils import load_private_keys
+
+KEYS = ['0x' + f'{i + 1:064x}' for i in range(5)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / 'private_keys.bin')
+    assert convert_keys_to_store(KEYS, path) == len(KEYS)
+    store = KeyStore(path)
+    yield store
+    store._mmap.close()
+
+
+def test_round_trip_keys_and_addresses(store):
+    assert len(store) == len(KEYS)
+    assert list(store) == KEYS
+    assert store[-1] == KEYS[-1]
+    for index, key in enumerate(KEYS):
+        assert store.address(index) == Account.from_key(key).address
+        assert stored_address(store, index) == store.address(index)
+    assert derive_addresses(store) == [Account.from_key(key).address for key in KEYS]
+
+
+def test_slice_is_view_of_same_file(store):
+    part = store[1:4]
+    assert isinstance(part, KeyStore)
+    assert part._mmap is store._mmap
+    assert list(part) == KEYS[1:4]
+    assert part.address(0) == Account.from_key(KEYS[1]).address
+    assert store[::2] == KEYS[::2]
+    with pytest.raises(IndexError):
+        part[3]
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="права доступа POSIX")
+def test_store_is_private_to_owner(tmp_path):
+    path = str(tmp_path / 'private_keys.bin')
+    # Оставшийся от прерванной конвертации файл с широкими правами
+    with open(f"{path}.tmp", 'wb'):
+        pass
+    os.chmod(f"{path}.tmp", 0o644)
+
+    convert_keys_to_store(KEYS, path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_text_keys_have_no_stored_address():
+    assert stored_address(KEYS, 0) is None
+
+
+def test_rejects_foreign_and_truncated_files(tmp_path):
+    foreign = tmp_path / 'foreign.bin'
+    foreign.write_bytes(HEADER.pack(b'NOTKEYS!', 0) + b'\0' * 8)
+    with pytest.raises(ValueError):
+        KeyStore(str(foreign))
+
+    truncated = tmp_path / 'truncated.bin'
+    truncated.write_bytes(HEADER.pack(MAGIC, 3) + b'\0' * 52)
+    with pytest.raises(ValueError):
+        KeyStore(str(truncated))
+
+
+def test_load_private_keys_prefers_fresh_store(tmp_path):
+    text_path = tmp_path / 'private_keys.txt'
+    text_path.write_text('\n'.join(KEYS), encoding='utf-8')
+    store_path = str(tmp_path / 'private_keys.bin')
+    convert_keys_to_store(KEYS, store_path)
+
+    keys = load_private_keys(str(text_path), store_path)
+    assert isinstance(keys, KeyStore)
+    assert list(keys) == KEYS
+    keys._mmap.close()
+
+    # Текстовый файл изменен после конвертации - ключи читаются из него
+    later = os.path.getmtime(store_path) + 10
+    os.utime(text_path, (later, later))
+    keys = load_private_keys(str(text_path), store_path)
+    assert not isinstance(keys, KeyStore)
+    assert list(keys) == KEYS
\ No newline at end of file
@@ -0,0 +1,42 @@
+from src.profiler import PhaseTimer
+
+
+def test_aggregate_matches_per_account_summary():
+    exact = PhaseTimer()
+    aggregate = PhaseTimer(aggregate=True)
+    for account_id in range(1, 101):
+        for timer in (exact, aggregate):
+            timer.add(account_id, 'receipt', account_id / 100)
+            timer.add(account_id, 'sign', 0.01)
+
+    assert aggregate.per_account() == {}
+    assert aggregate.summarize() == exact.summarize()
+
+
+def test_aggregate_keeps_bounded_sample():
+    timer = PhaseTimer(aggregate=True, reservoir_size=50)
+    for account_id in range(1000):
+        timer.add(account_id, 'receipt', float(account_id))
+
+    stats = timer.phases['receipt']
+    assert len(stats['samples']) == 50
+    summary = timer.summarize()['receipt']
+    assert summary['count'] == 1000
+    assert summary['max'] == 999.0
+    assert summary['total'] == sum(range(1000))
+
+
+def test_merge_phases_from_other_process():
+    coordinator = PhaseTimer(aggregate=True, reservoir_size=50)
+    shards = [PhaseTimer(aggregate=True, reservoir_size=50) for _ in range(2)]
+    for index, shard in enumerate(shards):
+        for account_id in range(40):
+            shard.add(account_id, 'broadcast', index + account_id / 100)
+
+    for shard in shards:
+        coordinator.merge_phases(shard.phases)
+
+    summary = coordinator.summarize()['broadcast']
+    assert summary['count'] == 80
+    assert summary['max'] == 1 + 39 / 100
+    assert len(coordinator.phases['broadcast']['samples']) == 50
\ No newline at end of file